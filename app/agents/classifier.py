@@ -1,5 +1,6 @@
 from typing import Dict, Any, Tuple
 from app.models.schemas import InputFormat, BusinessIntent
+from app.core.matching import KeywordMatcher
 
 class ClassifierAgent:
     def __init__(self):
@@ -12,6 +13,19 @@ class ClassifierAgent:
         self.complaint_keywords = ['complaint', 'issue', 'problem', 'error', 'wrong']
         self.regulation_keywords = ['regulation', 'compliance', 'policy', 'law', 'standard']
 
+        # Compile the keyword lists once per process
+        self.format_matcher = KeywordMatcher({
+            InputFormat.EMAIL: self.email_keywords,
+            InputFormat.JSON: self.json_keywords,
+            InputFormat.PDF: self.pdf_keywords
+        })
+        self.intent_matcher = KeywordMatcher({
+            BusinessIntent.INVOICE: self.invoice_keywords,
+            BusinessIntent.RFQ: self.rfq_keywords,
+            BusinessIntent.COMPLAINT: self.complaint_keywords,
+            BusinessIntent.REGULATION: self.regulation_keywords
+        })
+
     async def classify(self, content: str) -> Tuple[InputFormat, BusinessIntent, float]:
         """Classify input content into format and business intent."""
         # Determine format
@@ -29,12 +43,11 @@ class ClassifierAgent:
 
     def _determine_format(self, content: str) -> Dict[InputFormat, float]:
         """Determine the format of the content using keyword matching."""
-        content_lower = content.lower()
-        
         # Count keyword matches for each format
-        email_score = sum(1 for kw in self.email_keywords if kw in content_lower)
-        json_score = sum(1 for kw in self.json_keywords if kw in content_lower)
-        pdf_score = sum(1 for kw in self.pdf_keywords if kw in content_lower)
+        scores = self.format_matcher.scores(content)
+        email_score = scores[InputFormat.EMAIL]
+        json_score = scores[InputFormat.JSON]
+        pdf_score = scores[InputFormat.PDF]
         
         # Calculate normalized scores
         total_score = email_score + json_score + pdf_score
@@ -49,13 +62,12 @@ class ClassifierAgent:
 
     def _determine_intent(self, content: str) -> Dict[BusinessIntent, float]:
         """Determine the business intent using keyword matching."""
-        content_lower = content.lower()
-        
         # Count keyword matches for each intent
-        invoice_score = sum(1 for kw in self.invoice_keywords if kw in content_lower)
-        rfq_score = sum(1 for kw in self.rfq_keywords if kw in content_lower)
-        complaint_score = sum(1 for kw in self.complaint_keywords if kw in content_lower)
-        regulation_score = sum(1 for kw in self.regulation_keywords if kw in content_lower)
+        scores = self.intent_matcher.scores(content)
+        invoice_score = scores[BusinessIntent.INVOICE]
+        rfq_score = scores[BusinessIntent.RFQ]
+        complaint_score = scores[BusinessIntent.COMPLAINT]
+        regulation_score = scores[BusinessIntent.REGULATION]
         
         # Calculate normalized scores
         total_score = invoice_score + rfq_score + complaint_score + regulation_score
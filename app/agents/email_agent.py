@@ -1,8 +1,25 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional, Union
+import asyncio
+import re
+from email import policy
+from email.message import EmailMessage
+from email import message_from_bytes, message_from_string
 from app.models.schemas import Tone, Urgency, AgentResponse
+from app.agents.json_agent import JsonAgent
+from app.agents.pdf_agent import PdfAgent
+from app.core.matching import KeywordMatcher
+
+# Forwarded messages (message/rfc822) are searched for attachments this deep
+MAX_NESTED_MESSAGES = 3
 
 class EmailAgent:
-    def __init__(self):
+    def __init__(
+        self,
+        pdf_agent: Optional[PdfAgent] = None,
+        json_agent: Optional[JsonAgent] = None,
+        max_attachment_bytes: int = 10 * 1024 * 1024,
+        max_concurrent_attachments: int = 4
+    ):
         self.tone_keywords = {
             Tone.POLITE: ['dear', 'sincerely', 'regards', 'respectfully', 'please', 'thank you'],
             Tone.ESCALATION: ['urgent', 'immediately', 'asap', 'critical'],
@@ -12,7 +29,7 @@ class EmailAgent:
             Tone.INFORMAL: ['hi', 'hello', 'hey', 'thanks', 'cheers'],
             Tone.COMPLAINT: ['unhappy', 'dissatisfied', 'poor', 'bad', 'wrong']
         }
-        
+
         self.urgency_keywords = {
             Urgency.HIGH: ['urgent', 'immediately', 'asap', 'critical', 'emergency'],
             Urgency.MEDIUM: ['soon', 'shortly', 'prompt', 'timely'],
@@ -20,29 +37,52 @@ class EmailAgent:
             Urgency.CRITICAL: ['critical', 'emergency', 'immediate', 'urgent']
         }
 
-    async def process(self, content: str) -> AgentResponse:
+        # Compile the keyword tables once; scoring order follows the enums
+        self.tone_matcher = KeywordMatcher({tone: self.tone_keywords.get(tone, []) for tone in Tone})
+        self.urgency_matcher = KeywordMatcher({urgency: self.urgency_keywords.get(urgency, []) for urgency in Urgency})
+
+        # Agents that attachments are fanned out to
+        self.pdf_agent = pdf_agent or PdfAgent()
+        self.json_agent = json_agent or JsonAgent()
+
+        # Attachments larger than this are never decoded, and at most
+        # max_concurrent_attachments are held decoded at the same time
+        self.max_attachment_bytes = max_attachment_bytes
+        self.max_concurrent_attachments = max_concurrent_attachments
+
+    async def process(self, content: Union[str, bytes]) -> AgentResponse:
         """Process email content and extract structured information."""
         try:
+            message = self._parse_message(content)
+
             # Extract basic email fields
-            fields = self._extract_fields(content)
-            
+            fields = self._extract_fields(message)
+
+            # Only the subject and text parts are scanned for tone and urgency
+            text = f"{fields.get('subject', '')}\n{fields['body']}"
+
             # Analyze tone
-            tone = self._analyze_tone(content)
-            
+            tone = self._analyze_tone(text)
+
             # Analyze urgency
-            urgency = self._analyze_urgency(content)
-            
+            urgency = self._analyze_urgency(text)
+
+            # Hand PDF and JSON attachments to their format agents
+            attachments = await self._process_attachments(message)
+            fields['attachments'] = [a['filename'] for a in attachments]
+
             return AgentResponse(
                 success=True,
                 message="Email processed successfully",
                 data={
                     "fields": fields,
                     "tone": tone.value,
-                    "urgency": urgency.value
+                    "urgency": urgency.value,
+                    "attachments": attachments
                 },
                 next_action="route_to_action"
             )
-            
+
         except Exception as e:
             return AgentResponse(
                 success=False,
@@ -50,48 +90,132 @@ class EmailAgent:
                 error=str(e)
             )
 
-    def _extract_fields(self, content: str) -> Dict[str, str]:
-        """Extract basic email fields using simple parsing."""
+    def _parse_message(self, content: Union[str, bytes]) -> EmailMessage:
+        """Parse raw email content into a MIME message."""
+        if isinstance(content, bytes):
+            return message_from_bytes(content.lstrip(b'\r\n \t'), policy=policy.default)
+        return message_from_string(content.lstrip('\r\n \t'), policy=policy.default)
+
+    def _extract_fields(self, message: EmailMessage) -> Dict[str, Any]:
+        """Extract header fields and the decoded text body."""
         fields = {}
-        lines = content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('Subject:'):
-                fields['subject'] = line[8:].strip()
-            elif line.startswith('From:'):
-                fields['from'] = line[5:].strip()
-            elif line.startswith('To:'):
-                fields['to'] = line[3:].strip()
-            elif line.startswith('Date:'):
-                fields['date'] = line[5:].strip()
-                
-        # Extract body
-        body_start = 0
-        for i, line in enumerate(lines):
-            if line.strip() == '':
-                body_start = i + 1
-                break
-        fields['body'] = '\n'.join(lines[body_start:]).strip()
-        
+
+        for header, name in (('subject', 'Subject'), ('from', 'From'), ('to', 'To'), ('date', 'Date')):
+            value = message.get(name)
+            if value is not None:
+                fields[header] = str(value).strip()
+
+        # Extract body from the text parts only
+        fields['body'] = '\n'.join(self._iter_text_parts(message)).strip()
+
         return fields
 
+    def _iter_text_parts(self, message: EmailMessage) -> List[str]:
+        """Decode the inline text parts, preferring text/plain over text/html."""
+        plain, html = [], []
+
+        for part in message.walk():
+            if part.is_multipart() or part.get_content_disposition() == 'attachment':
+                continue
+            content_type = part.get_content_type()
+            if content_type == 'text/plain':
+                plain.append(self._decode_text(part))
+            elif content_type == 'text/html':
+                html.append(re.sub(r'<[^>]+>', ' ', self._decode_text(part)))
+
+        return plain or html
+
+    def _decode_text(self, part: EmailMessage) -> str:
+        """Decode a text part, tolerating unknown or wrong charsets."""
+        try:
+            return part.get_content()
+        except (LookupError, UnicodeDecodeError):
+            payload = part.get_payload(decode=True) or b''
+            return payload.decode('utf-8', errors='replace')
+
+    def _attachment_kind(self, part: EmailMessage) -> Optional[str]:
+        """Map an attachment onto the agent that understands it."""
+        content_type = part.get_content_type()
+        filename = (part.get_filename() or '').lower()
+
+        if content_type == 'application/pdf' or filename.endswith('.pdf'):
+            return 'pdf'
+        if content_type == 'application/json' or filename.endswith('.json'):
+            return 'json'
+        return None
+
+    def _estimate_size(self, part: EmailMessage) -> int:
+        """Estimate the decoded size of a part without decoding it."""
+        raw = part.get_payload()
+        if not isinstance(raw, str):
+            return 0
+        if part.get('Content-Transfer-Encoding', '').lower() == 'base64':
+            return len(raw) * 3 // 4
+        return len(raw)
+
+    def _iter_attachments(self, message: EmailMessage, depth: int = 0) -> Iterator[EmailMessage]:
+        """Yield the attachments of a message and of the messages forwarded in it."""
+        if not message.is_multipart():
+            return
+        for part in message.iter_attachments():
+            if part.get_content_type() == 'message/rfc822' and depth < MAX_NESTED_MESSAGES:
+                for nested in part.iter_parts():
+                    yield from self._iter_attachments(nested, depth + 1)
+            else:
+                yield part
+
+    async def _process_attachments(self, message: EmailMessage) -> List[Dict[str, Any]]:
+        """Fan PDF and JSON attachments out to their agents concurrently."""
+        semaphore = asyncio.Semaphore(self.max_concurrent_attachments)
+        attachments = []
+        tasks = []
+
+        for part in self._iter_attachments(message):
+            kind = self._attachment_kind(part)
+            size = self._estimate_size(part)
+            attachment = {
+                "filename": part.get_filename() or "",
+                "content_type": part.get_content_type(),
+                "size": size,
+                "agent": kind
+            }
+            attachments.append(attachment)
+
+            if kind is None:
+                attachment["skipped"] = "unsupported_type"
+            elif size > self.max_attachment_bytes:
+                attachment["skipped"] = "too_large"
+            else:
+                tasks.append(self._run_attachment_agent(part, kind, attachment, semaphore))
+
+        await asyncio.gather(*tasks)
+        return attachments
+
+    async def _run_attachment_agent(
+        self,
+        part: EmailMessage,
+        kind: str,
+        attachment: Dict[str, Any],
+        semaphore: asyncio.Semaphore
+    ) -> None:
+        """Decode one attachment and merge its agent result into the entry."""
+        async with semaphore:
+            # Payloads are decoded only here, inside the concurrency bound
+            payload = part.get_payload(decode=True) or b''
+
+            if kind == 'pdf':
+                result = await self.pdf_agent.process(payload)
+            else:
+                result = await asyncio.to_thread(
+                    self.json_agent.process, payload.decode('utf-8', errors='replace')
+                )
+
+        attachment["result"] = result.model_dump()
+
     def _analyze_tone(self, content: str) -> Tone:
         """Analyze email tone using keyword matching."""
-        content_lower = content.lower()
-        tone_scores = {tone: 0 for tone in Tone}
-        
-        for tone, keywords in self.tone_keywords.items():
-            tone_scores[tone] = sum(1 for kw in keywords if kw in content_lower)
-            
-        return max(tone_scores.items(), key=lambda x: x[1])[0]
+        return self.tone_matcher.best(content)
 
     def _analyze_urgency(self, content: str) -> Urgency:
         """Analyze email urgency using keyword matching."""
-        content_lower = content.lower()
-        urgency_scores = {urgency: 0 for urgency in Urgency}
-        
-        for urgency, keywords in self.urgency_keywords.items():
-            urgency_scores[urgency] = sum(1 for kw in keywords if kw in content_lower)
-            
-        return max(urgency_scores.items(), key=lambda x: x[1])[0] 
\ No newline at end of file
+        return self.urgency_matcher.best(content)
\ No newline at end of file
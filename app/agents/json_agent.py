@@ -1,7 +1,9 @@
 from typing import Dict, Any, List, Optional
 import json
-from jsonschema import validate, ValidationError
+from jsonschema import ValidationError
+from jsonschema.validators import validator_for
 from ..models.schemas import JsonInput, AgentResponse
+from ..core.tracing import traced
 
 class JsonAgent:
     def __init__(self):
@@ -59,16 +61,21 @@ class JsonAgent:
             }
         }
 
+        # Check each schema once and keep a ready validator for it
+        self.validators = {}
+        for schema_name, schema in self.schemas.items():
+            validator_class = validator_for(schema)
+            validator_class.check_schema(schema)
+            self.validators[schema_name] = validator_class(schema)
+
     def detect_schema(self, data: Dict[str, Any]) -> Optional[str]:
         """Detect which schema the JSON data matches."""
-        for schema_name, schema in self.schemas.items():
-            try:
-                validate(instance=data, schema=schema)
+        for schema_name, validator in self.validators.items():
+            if validator.is_valid(data):
                 return schema_name
-            except ValidationError:
-                continue
         return None
 
+    @traced("json.validate")
     def validate_data(self, data: Dict[str, Any], schema_name: Optional[str] = None) -> Dict[str, Any]:
         """Validate JSON data against a specific schema or try to detect the schema."""
         validation_result = {
@@ -86,7 +93,7 @@ class JsonAgent:
                     return validation_result
 
             # Validate against the schema
-            validate(instance=data, schema=self.schemas[schema_name])
+            self.validators[schema_name].validate(data)
             validation_result["is_valid"] = True
             validation_result["schema"] = schema_name
 
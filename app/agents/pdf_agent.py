@@ -1,6 +1,9 @@
-from typing import Dict, Any, List
-from PyPDF2 import PdfReader
+from typing import Dict, Any, List, Union
+import asyncio
+import io
 from app.models.schemas import AgentResponse
+from app.core.matching import KeywordMatcher
+from app.core.tracing import traced
 
 class PdfAgent:
     def __init__(self):
@@ -16,11 +19,18 @@ class PdfAgent:
             'policy': ['policy', 'procedure', 'guideline', 'rule', 'regulation']
         }
 
-    async def process(self, content: str) -> AgentResponse:
+        # Compile the keyword tables once per process
+        self.document_type_matcher = KeywordMatcher(self.document_type_keywords)
+        self.compliance_matcher = KeywordMatcher({'compliance': self.compliance_keywords})
+
+    async def process(self, content: Union[str, bytes]) -> AgentResponse:
         """Process PDF content and extract structured information."""
         try:
-            # Extract text from PDF
-            text = self._extract_text(content)
+            # Extract text from PDF, off the event loop for binary documents
+            if isinstance(content, bytes):
+                text = await asyncio.to_thread(self._extract_text, content)
+            else:
+                text = self._extract_text(content)
             
             # Analyze content
             doc_type = self._analyze_document_type(text)
@@ -44,15 +54,22 @@ class PdfAgent:
                 error=str(e)
             )
 
-    def _extract_text(self, content: str) -> str:
+    @traced("pdf.extract_text")
+    def _extract_text(self, content: Union[str, bytes]) -> str:
         """Extract text from PDF content."""
-        try:
+        if isinstance(content, bytes):
+            if not content.startswith(b'%PDF'):
+                return content.decode('utf-8', errors='replace')
+        elif not content.startswith('%PDF'):
             # If content is already text, return it
-            if not content.startswith('%PDF'):
-                return content
-                
-            # Otherwise, try to parse as PDF
-            reader = PdfReader(content)
+            return content
+        else:
+            content = content.encode('latin-1', errors='replace')
+
+        try:
+            # Otherwise, try to parse as PDF; PyPDF2 is only imported when needed
+            from PyPDF2 import PdfReader
+            reader = PdfReader(io.BytesIO(content))
             text = ""
             for page in reader.pages:
                 text += page.extract_text() + "\n"
@@ -60,25 +77,13 @@ class PdfAgent:
             
         except Exception:
             # Fallback to raw content
-            return content
+            return content.decode('latin-1')
 
     def _analyze_document_type(self, text: str) -> str:
         """Analyze document type using keyword matching."""
-        text_lower = text.lower()
-        type_scores = {doc_type: 0 for doc_type in self.document_type_keywords}
-        
-        for doc_type, keywords in self.document_type_keywords.items():
-            type_scores[doc_type] = sum(1 for kw in keywords if kw in text_lower)
-            
-        return max(type_scores.items(), key=lambda x: x[1])[0]
+        return self.document_type_matcher.best(text)
 
     def _check_compliance(self, text: str) -> List[str]:
         """Check for compliance-related terms."""
-        text_lower = text.lower()
-        flags = []
-        
-        for keyword in self.compliance_keywords:
-            if keyword in text_lower:
-                flags.append(keyword)
-                
-        return flags 
\ No newline at end of file
+        found = self.compliance_matcher.find(text.lower())
+        return [keyword for keyword in self.compliance_keywords if keyword in found]
\ No newline at end of file
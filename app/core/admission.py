@@ -0,0 +1,245 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Optional, Dict, Any, Deque, Callable, Iterable
+
+# Only the start of a document is inspected before admission
+SNIFF_BYTES = 4096
+
+CRITICAL_HINTS = ('critical', 'emergency', 'legal action', 'lawsuit', 'outage')
+HIGH_HINTS = ('urgent', 'asap', 'immediately', 'escalat')
+
+
+class Priority(IntEnum):
+    CRITICAL = 0
+    HIGH = 1
+    NORMAL = 2
+    BULK = 3
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is refused; maps onto 429 with Retry-After."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def sniff_priority(content: str, source: Optional[str] = None, source_priorities: Optional[Dict[str, Priority]] = None) -> Priority:
+    """Guess a request's priority from cheap signals, before any agent runs.
+
+    Wording can raise a source by at most one level, so neither a bulk
+    source nor an unconfigured one can reach the critical slots by writing
+    "critical"; only sources configured as high can.
+    """
+    source_priorities = source_priorities or {}
+    head = content[:SNIFF_BYTES].lower()
+
+    # Structured webhook payloads are bulk traffic; words inside them are data
+    if head.lstrip().startswith(('{', '[')):
+        return source_priorities.get(source, Priority.BULK)
+
+    base = source_priorities.get(source, Priority.NORMAL)
+    ceiling = Priority(max(base - 1, Priority.CRITICAL))
+    if any(hint in head for hint in CRITICAL_HINTS):
+        return ceiling
+    if any(hint in head for hint in HIGH_HINTS):
+        return min(base, max(ceiling, Priority.HIGH))
+    return base
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take one token; returns 0 on success or the seconds until one is available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Bounded priority queues in front of the processing pipeline.
+
+    At most max_concurrency requests are processed at once, and
+    reserved_critical of those slots are only ever given to critical
+    requests. Waiters are served highest priority first. Each priority
+    has its own queue bound; once max_queued requests are waiting in
+    total, a new request displaces the newest waiter of a lower priority,
+    or is rejected if there is none. Waiters also give up after their
+    priority's max wait. Clients are limited by token buckets keyed on
+    their address, which the client cannot choose the way it chooses its
+    source; only trusted_clients bypass them.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        reserved_critical: int = 4,
+        max_queued: int = 1000,
+        queue_sizes: Optional[Dict[Priority, int]] = None,
+        max_wait: Optional[Dict[Priority, float]] = None,
+        client_rate: float = 0.0,
+        client_burst: Optional[float] = None,
+        max_clients: int = 10000,
+        trusted_clients: Iterable[str] = (),
+        source_priorities: Optional[Dict[str, Priority]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_concurrency = max_concurrency
+        self.reserved_critical = min(reserved_critical, max_concurrency - 1)
+        self.max_queued = max_queued
+        self.queue_sizes = queue_sizes or {
+            Priority.CRITICAL: 1000, Priority.HIGH: 500, Priority.NORMAL: 500, Priority.BULK: 200
+        }
+        self.max_wait = max_wait or {
+            Priority.CRITICAL: 30.0, Priority.HIGH: 10.0, Priority.NORMAL: 5.0, Priority.BULK: 2.0
+        }
+        self.client_rate = client_rate
+        self.client_burst = client_burst or max(1.0, client_rate)
+        self.max_clients = max_clients
+        self.trusted_clients = frozenset(trusted_clients)
+        self.source_priorities = source_priorities or {}
+        self.clock = clock
+
+        self.active = 0
+        self.queues: Dict[Priority, Deque[asyncio.Future]] = {p: deque() for p in Priority}
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.service_time = 0.05
+        self.rejected: Dict[str, int] = {}
+
+    def priority_for(self, content: str, source: Optional[str] = None) -> Priority:
+        return sniff_priority(content, source, self.source_priorities)
+
+    def _limit(self, priority: Priority) -> int:
+        if priority == Priority.CRITICAL:
+            return self.max_concurrency
+        return self.max_concurrency - self.reserved_critical
+
+    def _waiting(self, up_to: Priority) -> bool:
+        return any(self.queues[p] for p in Priority if p <= up_to)
+
+    def _queued(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained."""
+        backlog = self._queued() + self.active
+        return max(1, math.ceil(backlog * self.service_time / self.max_concurrency))
+
+    def _reject(self, reason: str, retry_after: Optional[int] = None) -> AdmissionRejected:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return AdmissionRejected(reason, retry_after or self.retry_after())
+
+    def _check_rate(self, client: str) -> None:
+        # Neither wording nor the source name is trusted, only the client's address
+        if self.client_rate <= 0 or client in self.trusted_clients:
+            return
+        now = self.clock()
+        bucket = self.buckets.pop(client, None) or TokenBucket(self.client_rate, self.client_burst, now)
+        self.buckets[client] = bucket
+        if len(self.buckets) > self.max_clients:
+            self.buckets.popitem(last=False)
+
+        wait = bucket.take(now)
+        if wait:
+            raise self._reject("rate_limited", max(1, math.ceil(wait)))
+
+    def _shed_lower(self, priority: Priority) -> bool:
+        """Reject the newest waiter of the lowest priority below `priority`."""
+        for lower in sorted(Priority, reverse=True):
+            if lower <= priority:
+                return False
+            queue = self.queues[lower]
+            while queue:
+                future = queue.pop()
+                if not future.done():
+                    future.set_exception(self._reject("shed"))
+                    return True
+        return False
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the highest-priority waiters."""
+        for priority in Priority:
+            queue = self.queues[priority]
+            while queue and self.active < self._limit(priority):
+                future = queue.popleft()
+                if not future.done():
+                    self.active += 1
+                    future.set_result(None)
+            if queue:
+                # Lower priorities may not overtake a blocked higher one
+                return
+
+    async def _acquire(self, priority: Priority) -> None:
+        if self.active < self._limit(priority) and not self._waiting(priority):
+            self.active += 1
+            return
+
+        queue = self.queues[priority]
+        if len(queue) >= self.queue_sizes[priority]:
+            raise self._reject("queue_full")
+        if self._queued() >= self.max_queued and not self._shed_lower(priority):
+            raise self._reject("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        try:
+            await asyncio.wait_for(future, timeout=self.max_wait[priority])
+        except asyncio.TimeoutError:
+            self._abandon(queue, future)
+            raise self._reject("queue_timeout")
+        except BaseException:
+            self._abandon(queue, future)
+            raise
+
+    def _abandon(self, queue: Deque[asyncio.Future], future: asyncio.Future) -> None:
+        """Clean up after a waiter that stopped waiting."""
+        if future.done() and not future.cancelled() and future.exception() is None:
+            # The slot was granted just before the waiter went away
+            self.active -= 1
+            self._dispatch()
+        elif future in queue:
+            queue.remove(future)
+
+    def release(self, elapsed: float) -> None:
+        """Return a slot taken with acquire(), after `elapsed` seconds of work."""
+        self.active -= 1
+        # Exponentially weighted service time, for Retry-After estimates
+        self.service_time = 0.9 * self.service_time + 0.1 * elapsed
+        self._dispatch()
+
+    async def acquire(self, priority: Priority, client: str = "anonymous") -> None:
+        """Take a processing slot for a client address, or raise AdmissionRejected; pair with release()."""
+        self._check_rate(client)
+        await self._acquire(priority)
+
+    @asynccontextmanager
+    async def admit(self, priority: Priority, client: str = "anonymous"):
+        """Hold a processing slot for the duration of the block, or raise AdmissionRejected."""
+        await self.acquire(priority, client)
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.release(self.clock() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queued": {p.name.lower(): len(q) for p, q in self.queues.items()},
+            "rejected": dict(self.rejected),
+            "service_time_s": round(self.service_time, 4)
+        }
@@ -0,0 +1,169 @@
+import os
+from functools import cached_property
+from typing import Dict, Optional
+from .decisions import DEFAULT_RULES_PATH
+
+
+class Components:
+    """Application components, each built on first use.
+
+    Agents and the tables they compile (keyword matchers, schema validators,
+    routing rules, flow graphs) hold no sockets, so preload() can build them in a
+    preloading master process and forked workers share them copy-on-write.
+    Network clients are only created inside the worker that uses them.
+    """
+
+    PRELOADABLE = ("classifier", "json_agent", "pdf_agent", "email_agent", "decision_table", "flows")
+    CLIENTS = ("memory_store", "stats_engine", "action_router", "control_redis", "tracer", "profiler", "status_hub")
+
+    def __init__(self, redis_url: Optional[str] = None, rules_path: Optional[str] = None):
+        # A comma-separated REDIS_URL shards the memory store over several nodes
+        self.redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
+        self.redis_urls = [url.strip() for url in self.redis_url.split(",") if url.strip()]
+        self.redis_cluster = os.getenv("REDIS_CLUSTER") == "1"
+        self.memory_partitions = int(os.getenv("MEMORY_PARTITIONS", "0")) or None
+        self.rules_path = rules_path or os.getenv("ROUTING_RULES_PATH", DEFAULT_RULES_PATH)
+        self.preloaded = False
+        self.preload_error: Optional[str] = None
+
+    @cached_property
+    def classifier(self):
+        from ..agents.classifier import ClassifierAgent
+        return ClassifierAgent()
+
+    @cached_property
+    def json_agent(self):
+        from ..agents.json_agent import JsonAgent
+        return JsonAgent()
+
+    @cached_property
+    def pdf_agent(self):
+        from ..agents.pdf_agent import PdfAgent
+        return PdfAgent()
+
+    @cached_property
+    def email_agent(self):
+        from ..agents.email_agent import EmailAgent
+        return EmailAgent(pdf_agent=self.pdf_agent, json_agent=self.json_agent)
+
+    @cached_property
+    def decision_table(self):
+        from .decisions import DecisionTable
+        from .router import ACTIONS
+        return DecisionTable(self.rules_path, known_actions=ACTIONS)
+
+    @cached_property
+    def flows(self):
+        from .flows import FlowLibrary, FLOWS_DIR
+        return FlowLibrary(self, os.getenv("FLOWS_DIR", FLOWS_DIR))
+
+    @cached_property
+    def memory_store(self):
+        from .memory import MemoryStore, ShardedMemoryStore, CONTENT_MAX_BYTES, CONTENT_TTL
+        # Raw inputs kept for reprocessing
+        content = {
+            "content_max_bytes": int(os.getenv("STORE_CONTENT_MAX_BYTES", str(CONTENT_MAX_BYTES))),
+            "content_ttl": int(os.getenv("STORE_CONTENT_TTL_S", str(CONTENT_TTL)))
+        }
+        if len(self.redis_urls) > 1:
+            # The shared ring lives on the first node, next to the other coordination state
+            return ShardedMemoryStore.from_urls(
+                self.redis_urls, partitions=self.memory_partitions or 64, control=self.control_redis, **content
+            )
+        if self.redis_cluster:
+            return MemoryStore(self.redis_urls[0], partitions=self.memory_partitions or 16, cluster=True, **content)
+        return MemoryStore(self.redis_urls[0], partitions=self.memory_partitions or 1, **content)
+
+    @cached_property
+    def stats_engine(self):
+        from .stats import StatisticsEngine
+        return StatisticsEngine(self.redis_urls[0], cluster=self.redis_cluster)
+
+    @cached_property
+    def action_router(self):
+        from .router import ActionRouter
+        return ActionRouter(os.getenv("ACTION_BASE_URL", "http://localhost:8000"))
+
+    @cached_property
+    def admission(self):
+        from .admission import AdmissionController, Priority
+        # ADMISSION_SOURCE_PRIORITIES="partner=high,batch=bulk"
+        source_priorities = {
+            name.strip(): Priority[level.strip().upper()]
+            for name, level in (
+                pair.split("=", 1) for pair in os.getenv("ADMISSION_SOURCE_PRIORITIES", "").split(",") if "=" in pair
+            )
+        }
+        return AdmissionController(
+            max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", "32")),
+            reserved_critical=int(os.getenv("ADMISSION_RESERVED_CRITICAL", "4")),
+            max_queued=int(os.getenv("ADMISSION_MAX_QUEUED", "1000")),
+            client_rate=float(os.getenv("CLIENT_RATE_LIMIT", "0")),
+            client_burst=float(os.getenv("CLIENT_RATE_BURST", "0")) or None,
+            # ADMISSION_TRUSTED_CLIENTS="10.0.0.5,10.0.0.6" skip the rate limit
+            trusted_clients=[c.strip() for c in os.getenv("ADMISSION_TRUSTED_CLIENTS", "").split(",") if c.strip()],
+            source_priorities=source_priorities
+        )
+
+    @cached_property
+    def tracer(self):
+        from .tracing import Tracer, exporter_from_spec
+        # TRACE_EXPORT="file:traces.jsonl" or "otlp:http://collector:4318"
+        spec = os.getenv("TRACE_EXPORT")
+        slow_ms = os.getenv("TRACE_SLOW_MS")
+        return Tracer(
+            exporter_from_spec(spec) if spec else None,
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+            slow_ms=float(slow_ms) if slow_ms else None
+        )
+
+    @cached_property
+    def control_redis(self):
+        """Client for coordination state shared by workers and jobs (not entry data)."""
+        import redis
+        if self.redis_cluster:
+            return redis.RedisCluster.from_url(self.redis_urls[0], decode_responses=True)
+        return redis.Redis.from_url(self.redis_urls[0], decode_responses=True)
+
+    @cached_property
+    def profiler(self):
+        from .profiling import SamplingProfiler
+        # Shares arm commands and captures with the other workers
+        return SamplingProfiler(self.control_redis)
+
+    @cached_property
+    def status_hub(self):
+        from redis import asyncio as aioredis
+        from .events import StatusHub
+        # Publishes through the shared client; one pub/sub connection per worker listens
+        return StatusHub(
+            self.control_redis,
+            aioredis.Redis.from_url(self.redis_urls[0], decode_responses=True),
+            max_subscriptions=int(os.getenv("STATUS_MAX_SUBSCRIPTIONS", "50000")),
+            queue_size=int(os.getenv("STATUS_QUEUE_SIZE", "16")),
+            heartbeat=float(os.getenv("STATUS_HEARTBEAT_S", "15")),
+            status_ttl=int(os.getenv("STATUS_TTL_S", "86400"))
+        )
+
+    def preload(self) -> None:
+        """Build every component that is safe to share across forked workers."""
+        for name in self.PRELOADABLE:
+            getattr(self, name)
+
+        # Heavy modules only needed for binary PDFs
+        import PyPDF2  # noqa: F401
+
+        self.preloaded = True
+
+    def loaded(self) -> Dict[str, bool]:
+        """Report which components have been built in this process."""
+        return {name: name in self.__dict__ for name in self.PRELOADABLE + self.CLIENTS}
+
+    async def close(self) -> None:
+        """Release network clients created by this process."""
+        if "action_router" in self.__dict__:
+            await self.action_router.close()
+        if "tracer" in self.__dict__:
+            self.tracer.close()
+        if "status_hub" in self.__dict__:
+            await self.status_hub.close()
@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional, List, Dict, Any, Iterable
+from ..models.schemas import InputFormat, BusinessIntent, Tone, Urgency, AgentResponse, RoutingDecision
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), "routing_rules.json")
+
+# Every fact a rule can test, with the finite set of values it can take
+DIMENSIONS: Dict[str, List[Any]] = {
+    "format": [f.value for f in InputFormat],
+    "intent": [i.value for i in BusinessIntent],
+    "tone": [t.value for t in Tone] + [None],
+    "urgency": [u.value for u in Urgency] + [None],
+    "valid": [True, False],
+    "anomalies": [True, False],
+    "compliance": [True, False],
+    "fraud": [True, False],
+    "duplicate": [True, False]
+}
+
+
+class CompiledTable:
+    """Rule table compiled to one bitmask per (dimension, value).
+
+    Bit i is set in a mask when rule i accepts that value, so the rules
+    matching a document are the AND of one mask per dimension and the rule
+    that fires is the lowest set bit. Evaluation cost does not depend on
+    the number of rules.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], known_actions: Optional[Iterable[str]] = None):
+        known_actions = set(known_actions) if known_actions is not None else None
+        self.rules = rules
+        self.masks: Dict[str, Dict[Any, int]] = {dim: {value: 0 for value in values} for dim, values in DIMENSIONS.items()}
+        # Rules that do not test a dimension, used when a fact is missing
+        self.wildcards: Dict[str, int] = {dim: 0 for dim in DIMENSIONS}
+
+        for bit, rule in enumerate(rules):
+            name = rule.get("name") or f"rule_{bit}"
+            if not rule.get("action"):
+                raise ValueError(f"Rule {name} has no action")
+            if known_actions is not None and rule["action"] not in known_actions:
+                raise ValueError(f"Rule {name} routes to unknown action {rule['action']}")
+
+            conditions = rule.get("when", {})
+            unknown = set(conditions) - set(DIMENSIONS)
+            if unknown:
+                raise ValueError(f"Rule {name} tests unknown facts: {sorted(unknown)}")
+
+            for dim, values in DIMENSIONS.items():
+                if dim not in conditions:
+                    accepted = values
+                    self.wildcards[dim] |= 1 << bit
+                else:
+                    accepted = conditions[dim] if isinstance(conditions[dim], list) else [conditions[dim]]
+                    for value in accepted:
+                        if value not in self.masks[dim]:
+                            raise ValueError(f"Rule {name} uses invalid {dim} value {value!r}")
+                for value in accepted:
+                    self.masks[dim][value] |= 1 << bit
+
+        self.all_rules = (1 << len(rules)) - 1
+
+    def evaluate(self, facts: Dict[str, Any]) -> RoutingDecision:
+        """Return the first rule that matches the facts."""
+        mask = self.all_rules
+        for dim, masks in self.masks.items():
+            mask &= masks.get(facts.get(dim), self.wildcards[dim])
+            if not mask:
+                return RoutingDecision(facts=facts)
+
+        rule = self.rules[(mask & -mask).bit_length() - 1]
+        return RoutingDecision(rule=rule.get("name"), action=rule["action"], facts=facts)
+
+
+class DecisionTable:
+    """Routing rules loaded from a JSON file and hot-reloaded when it changes."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_RULES_PATH,
+        known_actions: Optional[Iterable[str]] = None,
+        reload_interval: float = 2.0
+    ):
+        self.path = path
+        self.known_actions = list(known_actions) if known_actions is not None else None
+        self.reload_interval = reload_interval
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._table = self._load()
+
+    def _load(self) -> CompiledTable:
+        with open(self.path) as f:
+            mtime = os.fstat(f.fileno()).st_mtime_ns
+            rules = json.load(f)["rules"]
+        table = CompiledTable(rules, self.known_actions)
+        self._mtime = mtime
+        return table
+
+    def reload_if_changed(self) -> bool:
+        """Recompile the table if the rules file changed; keep the old table on errors."""
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return False
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                if os.stat(self.path).st_mtime_ns == self._mtime:
+                    return False
+                self._table = self._load()
+                self.last_error = None
+                return True
+            except (OSError, ValueError, KeyError) as e:
+                self.last_error = str(e)
+                logger.error("Keeping previous routing rules, reload of %s failed: %s", self.path, e)
+                return False
+
+    @property
+    def rules(self) -> List[Dict[str, Any]]:
+        return self._table.rules
+
+    def evaluate(self, facts: Dict[str, Any]) -> RoutingDecision:
+        """Pick the next action for a set of document facts."""
+        self.reload_if_changed()
+        return self._table.evaluate(facts)
+
+    def decide(self, format_type: InputFormat, intent_type: BusinessIntent, result: AgentResponse) -> RoutingDecision:
+        """Pick the next action for a processed document."""
+        return self.evaluate(document_facts(format_type, intent_type, result))
+
+
+def document_facts(format_type: InputFormat, intent_type: BusinessIntent, result: AgentResponse) -> Dict[str, Any]:
+    """Reduce an agent result to the facts the rule table tests."""
+    data = result.data or {}
+    validation = data.get("validation_result") or {}
+
+    compliance_flags = list(data.get("compliance_flags") or [])
+    for attachment in data.get("attachments", []):
+        attachment_data = (attachment.get("result") or {}).get("data") or {}
+        compliance_flags.extend(attachment_data.get("compliance_flags") or [])
+
+    return {
+        "format": format_type.value,
+        "intent": intent_type.value,
+        "tone": data.get("tone"),
+        "urgency": data.get("urgency"),
+        "valid": result.success,
+        "anomalies": bool(data.get("anomalies") or validation.get("anomalies")),
+        "compliance": bool(compliance_flags),
+        "fraud": bool(data.get("fraud_signals")),
+        "duplicate": bool((data.get("correlation") or {}).get("duplicate_of"))
+    }
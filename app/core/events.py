@@ -0,0 +1,256 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Set, Tuple, Iterable
+
+logger = logging.getLogger(__name__)
+
+# One channel for every status event; each worker keeps only those it has subscribers for
+CHANNEL = "flowbit:status"
+# The last event of each process, replayed to subscribers that connect late
+STATUS_KEY = "flowbit:status:{}"
+TERMINAL_STATUSES = ("completed", "action_failed", "failed")
+
+# (process_id, terminal, JSON payload) as received, shared by every subscriber
+Event = Tuple[str, bool, str]
+
+
+class SubscriptionRejected(Exception):
+    """Raised when a worker cannot take another subscription."""
+
+
+class Subscription:
+    """Status events for a set of process IDs, buffered for one connection.
+
+    At most queue_size undelivered events are kept; older ones are dropped
+    and counted, so a slow reader costs bounded memory and learns it
+    should re-read the status. An idle subscription holds no buffer.
+    """
+
+    __slots__ = ("hub", "process_ids", "queue_size", "queue", "waiter", "dropped", "closed")
+
+    def __init__(self, hub: "StatusHub", process_ids: Tuple[str, ...], queue_size: int):
+        self.hub = hub
+        self.process_ids = process_ids
+        self.queue_size = queue_size
+        self.queue: Optional[deque] = None
+        self.waiter: Optional[asyncio.Future] = None
+        self.dropped = 0
+        self.closed = False
+
+    def _push(self, event: Event) -> None:
+        if self.queue is None:
+            self.queue = deque(maxlen=self.queue_size)
+        elif len(self.queue) == self.queue_size:
+            self.dropped += 1
+        self.queue.append(event)
+        self._wake()
+
+    def _wake(self) -> None:
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def get(self) -> List[Event]:
+        """Wait for events; an empty list is a heartbeat tick."""
+        if not self.queue:
+            self.waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self.waiter
+            finally:
+                self.waiter = None
+        events = list(self.queue or ())
+        # Release the buffer until the next event arrives
+        self.queue = None
+        return events
+
+    def take_dropped(self) -> int:
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.hub._remove(self)
+
+
+class StatusHub:
+    """Fans status events out to SSE and WebSocket subscribers.
+
+    Workers publish every event to one Redis channel, and each worker holds
+    a single pub/sub connection that hands events to its local subscribers
+    through an index by process ID. So a worker's Redis cost does not grow
+    with its subscriber count. Idle subscribers are woken by one shared
+    heartbeat loop instead of a timer each. The last event of every process
+    is also kept for status_ttl seconds, so late subscribers see where a
+    request stands, including requests that failed before being stored.
+    """
+
+    def __init__(
+        self,
+        publisher,
+        listener,
+        max_subscriptions: int = 50000,
+        max_ids: int = 100,
+        queue_size: int = 16,
+        heartbeat: float = 15.0,
+        status_ttl: int = 24 * 3600,
+        connect_timeout: float = 5.0
+    ):
+        self.publisher = publisher
+        self.listener = listener
+        self.max_subscriptions = max_subscriptions
+        self.max_ids = max_ids
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.status_ttl = status_ttl
+        self.connect_timeout = connect_timeout
+
+        self.by_id: Dict[str, Set[Subscription]] = {}
+        self.subscriptions: Set[Subscription] = set()
+        self.ready: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def publish(self, process_id: str, status: str, **fields: Any) -> None:
+        """Announce a status change to subscribers on every worker."""
+        event = {"process_id": process_id, "status": status, "at": datetime.now().isoformat(), **fields}
+        raw = json.dumps(event, default=str)
+        try:
+            # Recorded first, so a subscriber that misses the event still finds it;
+            # one round trip for both, this runs on the event loop
+            pipe = self.publisher.pipeline(transaction=False)
+            pipe.set(STATUS_KEY.format(process_id), raw, ex=self.status_ttl)
+            pipe.publish(CHANNEL, raw)
+            pipe.execute()
+        except Exception:
+            # Subscribers can still read /status; processing must not fail over it
+            logger.warning("Could not publish status event for %s", process_id, exc_info=True)
+
+    def recorded(self, process_ids: Iterable[str]) -> List[Event]:
+        """The last recorded event of each process ID that has one, marked as a snapshot."""
+        process_ids = list(process_ids)
+        if not process_ids:
+            return []
+        pipe = self.publisher.pipeline(transaction=False)
+        for process_id in process_ids:
+            pipe.get(STATUS_KEY.format(process_id))
+        events = []
+        for process_id, raw in zip(process_ids, pipe.execute()):
+            if raw:
+                event = {**json.loads(raw), "snapshot": True}
+                events.append((process_id, event.get("status") in TERMINAL_STATUSES, json.dumps(event)))
+        return events
+
+    async def subscribe(self, process_ids: Iterable[str]) -> Subscription:
+        """Start receiving events for up to max_ids process IDs."""
+        process_ids = tuple(dict.fromkeys(process_ids))
+        if len(process_ids) > self.max_ids:
+            raise ValueError(f"At most {self.max_ids} process IDs per subscription")
+        if len(self.subscriptions) >= self.max_subscriptions:
+            raise SubscriptionRejected("Too many subscriptions on this worker")
+
+        await self._start()
+        subscription = Subscription(self, process_ids, self.queue_size)
+        self.subscriptions.add(subscription)
+        for process_id in process_ids:
+            self.by_id.setdefault(process_id, set()).add(subscription)
+        return subscription
+
+    def update(self, subscription: Subscription, add: Iterable[str] = (), remove: Iterable[str] = ()) -> None:
+        """Change the process IDs a subscription follows."""
+        remove = set(remove)
+        kept = [process_id for process_id in subscription.process_ids if process_id not in remove]
+        added = [process_id for process_id in dict.fromkeys(add) if process_id not in kept]
+        if len(kept) + len(added) > self.max_ids:
+            raise ValueError(f"At most {self.max_ids} process IDs per subscription")
+
+        self._unindex(subscription, remove.intersection(subscription.process_ids))
+        for process_id in added:
+            self.by_id.setdefault(process_id, set()).add(subscription)
+        subscription.process_ids = tuple(kept + added)
+
+    def _unindex(self, subscription: Subscription, process_ids: Iterable[str]) -> None:
+        for process_id in process_ids:
+            subscribers = self.by_id.get(process_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.by_id[process_id]
+
+    def _remove(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+        self._unindex(subscription, subscription.process_ids)
+        subscription._wake()
+
+    async def _start(self) -> None:
+        if self.ready is None:
+            self.ready = asyncio.Event()
+            self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._beat())]
+        # Events published before the channel subscription is live would be missed
+        try:
+            await asyncio.wait_for(self.ready.wait(), self.connect_timeout)
+        except asyncio.TimeoutError:
+            raise SubscriptionRejected("Status channel unavailable")
+
+    async def _listen(self) -> None:
+        """Deliver events from the Redis channel, reconnecting on errors."""
+        backoff = 0.1
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.listener.pubsub()
+                await pubsub.subscribe(CHANNEL)
+                self.ready.set()
+                backoff = 0.1
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Status channel lost; reconnecting", exc_info=True)
+                # Anything published meanwhile is lost: tell subscribers to re-read
+                for subscription in self.subscriptions:
+                    subscription.dropped += 1
+                    subscription._wake()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 5.0)
+            finally:
+                try:
+                    if pubsub is not None:
+                        await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def dispatch(self, raw: str) -> None:
+        """Hand one published event to the local subscribers of its process ID."""
+        try:
+            event = json.loads(raw)
+            process_id = event["process_id"]
+        except (ValueError, KeyError, TypeError):
+            return
+        subscribers = self.by_id.get(process_id)
+        if subscribers:
+            item = (process_id, event.get("status") in TERMINAL_STATUSES, raw)
+            for subscription in subscribers:
+                subscription._push(item)
+
+    async def _beat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for subscription in list(self.subscriptions):
+                subscription._wake()
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.ready = None
+        for subscription in list(self.subscriptions):
+            subscription.close()
+        await self.listener.aclose()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"subscriptions": len(self.subscriptions), "process_ids": len(self.by_id)}
@@ -0,0 +1,212 @@
+import asyncio
+import glob
+import json
+import os
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
+from .tracing import span
+from ..models.schemas import AgentResponse
+
+FLOWS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "flows")
+# The agent graphs; the other files in flows/ use LangFlow-only node types
+FLOW_PATTERN = "*_agent.json"
+
+NodeRunner = Callable[[Any], Awaitable[Any]]
+
+
+def _input_node(components, config: Dict[str, Any]) -> NodeRunner:
+    async def run(value):
+        return value
+    return run
+
+
+def _output_node(components, config: Dict[str, Any]) -> NodeRunner:
+    async def run(value):
+        if isinstance(value, AgentResponse):
+            return value.model_dump(mode="json")
+        return value
+    return run
+
+
+def _classifier_node(components, config: Dict[str, Any]) -> NodeRunner:
+    classifier = components.classifier
+
+    async def run(content):
+        format_type, intent_type, confidence = await classifier.classify(content)
+        return {"format": format_type.value, "intent": intent_type.value, "confidence": confidence}
+    return run
+
+
+def _email_node(components, config: Dict[str, Any]) -> NodeRunner:
+    return components.email_agent.process
+
+
+def _pdf_node(components, config: Dict[str, Any]) -> NodeRunner:
+    return components.pdf_agent.process
+
+
+def _json_node(components, config: Dict[str, Any]) -> NodeRunner:
+    json_agent = components.json_agent
+
+    async def run(content):
+        return await asyncio.to_thread(json_agent.process, content)
+    return run
+
+
+# Node types in the flow files, mapped onto the agents that implement them
+NODE_TYPES: Dict[str, Callable[[Any, Dict[str, Any]], NodeRunner]] = {
+    "InputNode": _input_node,
+    "OutputNode": _output_node,
+    "ClassifierNode": _classifier_node,
+    "EmailProcessorNode": _email_node,
+    "JSONProcessorNode": _json_node,
+    "PDFProcessorNode": _pdf_node
+}
+
+
+class CompiledNode:
+    __slots__ = ("id", "type", "run", "deps", "signature")
+
+    def __init__(self, node_id: str, node_type: str, run: NodeRunner, deps: Tuple[str, ...], config: Dict[str, Any]):
+        self.id = node_id
+        self.type = node_type
+        self.run = run
+        self.deps = deps
+        # Identical type and configuration compute identical outputs from identical inputs
+        self.signature = (node_type, json.dumps(config, sort_keys=True))
+
+
+class CompiledFlow:
+    """A flow graph checked, bound to agents and ordered once, at load time.
+
+    Nodes are grouped into levels: every node's inputs come from earlier
+    levels, so the nodes of one level (independent branches) run
+    concurrently. A run is then a walk over the levels with no graph work
+    left to do.
+    """
+
+    def __init__(self, name: str, spec: Dict[str, Any], components):
+        self.name = name
+        self.description = spec.get("description", "")
+
+        nodes = {}
+        for node in spec.get("nodes", []):
+            if node["id"] in nodes:
+                raise ValueError(f"{name}: duplicate node {node['id']!r}")
+            if node.get("type") not in NODE_TYPES:
+                raise ValueError(f"{name}: unsupported node type {node.get('type')!r} on {node['id']!r}")
+            nodes[node["id"]] = node
+
+        deps: Dict[str, List[str]] = {node_id: [] for node_id in nodes}
+        for edge in spec.get("edges", []):
+            source, target = edge.get("source"), edge.get("target")
+            if source not in nodes or target not in nodes:
+                raise ValueError(f"{name}: edge {source!r} -> {target!r} references an unknown node")
+            deps[target].append(source)
+
+        inputs = [node_id for node_id, node in nodes.items() if node["type"] == "InputNode"]
+        outputs = [node_id for node_id, node in nodes.items() if node["type"] == "OutputNode"]
+        if len(inputs) != 1 or len(outputs) != 1:
+            raise ValueError(f"{name}: a flow needs exactly one InputNode and one OutputNode")
+        self.input_id, self.output_id = inputs[0], outputs[0]
+
+        # Kahn's algorithm, one level at a time
+        self.levels: List[List[CompiledNode]] = []
+        placed = set()
+        remaining = dict(deps)
+        while remaining:
+            ready = [node_id for node_id, sources in remaining.items() if all(s in placed for s in sources)]
+            if not ready:
+                raise ValueError(f"{name}: cycle between {sorted(remaining)}")
+            level = []
+            for node_id in ready:
+                node = nodes[node_id]
+                config = node.get("data", {})
+                run = NODE_TYPES[node["type"]](components, config)
+                level.append(CompiledNode(node_id, node["type"], run, tuple(deps[node_id]), config))
+                del remaining[node_id]
+            placed.update(ready)
+            self.levels.append(level)
+
+        for level in self.levels:
+            for node in level:
+                if node.id != self.input_id and not node.deps:
+                    raise ValueError(f"{name}: node {node.id!r} has no inputs")
+
+    async def run(self, content: Any, cache: Optional[Dict[Any, asyncio.Future]] = None) -> Any:
+        """Run the flow on one input and return its output node's value.
+
+        `cache` holds node outputs for one request. Pass the same dict to
+        several flow runs for the same request and any node with the same
+        type, configuration and inputs is computed once, even while another
+        run is still computing it.
+        """
+        cache = {} if cache is None else cache
+        keys: Dict[str, Any] = {}
+        outputs: Dict[str, Any] = {}
+
+        for level in self.levels:
+            if len(level) == 1:
+                node = level[0]
+                outputs[node.id] = await self._run_node(node, content, keys, outputs, cache)
+            else:
+                results = await asyncio.gather(*(self._run_node(n, content, keys, outputs, cache) for n in level))
+                for node, result in zip(level, results):
+                    outputs[node.id] = result
+        return outputs[self.output_id]
+
+    async def _run_node(self, node: CompiledNode, content: Any, keys: Dict[str, Any], outputs: Dict[str, Any], cache):
+        if node.id == self.input_id:
+            value = content
+            key = ("input", content if isinstance(content, (str, bytes)) else id(content))
+        else:
+            value = outputs[node.deps[0]] if len(node.deps) == 1 else {d: outputs[d] for d in node.deps}
+            key = (node.signature, tuple(keys[d] for d in node.deps))
+        keys[node.id] = key
+
+        pending = cache.get(key)
+        if pending is not None:
+            return await pending
+
+        # Run inline; the future only serves other runs asking for the same output
+        future = asyncio.get_running_loop().create_future()
+        cache[key] = future
+        try:
+            result = await self._execute(node, value)
+        except BaseException as e:
+            cache.pop(key, None)
+            future.set_exception(e)
+            future.exception()
+            raise
+        future.set_result(result)
+        return result
+
+    async def _execute(self, node: CompiledNode, value: Any) -> Any:
+        with span(f"flow.{self.name}.{node.id}", node_type=node.type):
+            return await node.run(value)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "levels": [[{"id": n.id, "type": n.type, "inputs": list(n.deps)} for n in level] for level in self.levels]
+        }
+
+
+class FlowLibrary:
+    """Every flow under a directory, compiled when the library is built."""
+
+    def __init__(self, components, directory: str = FLOWS_DIR, pattern: str = FLOW_PATTERN):
+        self.flows: Dict[str, CompiledFlow] = {}
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            with open(path) as f:
+                self.flows[name] = CompiledFlow(name, json.load(f), components)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.flows
+
+    def get(self, name: str) -> CompiledFlow:
+        return self.flows[name]
+
+    async def run(self, name: str, content: Any, cache: Optional[Dict[Any, asyncio.Future]] = None) -> Any:
+        return await self.flows[name].run(content, cache)
@@ -0,0 +1,120 @@
+import re
+from email.utils import parseaddr
+from typing import Dict, Any, List, Optional
+from ..models.schemas import InputFormat, AgentResponse
+
+INVOICE_NUMBER_PATTERN = re.compile(r'invoice\s*(?:number|no\.?|#)?\s*[:#]\s*([A-Z0-9][A-Z0-9-]+)', re.IGNORECASE)
+REQUEST_ID_PATTERN = re.compile(r'\b(RFQ-[A-Z0-9-]+)', re.IGNORECASE)
+AMOUNT_PATTERN = re.compile(
+    r'(?:total amount|amount due|total|amount)\s*:?\s*([$€£]|USD|EUR|GBP)?\s*(\d[\d,]*(?:\.\d+)?)',
+    re.IGNORECASE
+)
+CURRENCY_SYMBOLS = {'$': 'USD', '€': 'EUR', '£': 'GBP'}
+
+# Keys in JSON payloads that name the party submitting the document
+SENDER_KEYS = ['sender', 'vendor', 'vendor_id', 'supplier', 'payee', 'customer_id']
+
+
+def extract_identifiers(format_type: InputFormat, result: AgentResponse, source: Optional[str] = None) -> Dict[str, Any]:
+    """Extract business identifiers (sender, invoice number, amount, ...) from an agent result."""
+    data = result.data or {}
+    identifiers: Dict[str, Any] = {
+        "source": source or format_type.value,
+        # Decides whether invoice numbers and amounts are indexed as documents or mentions
+        "format": format_type.value,
+        "sender": None,
+        "invoice_number": None,
+        "request_id": None,
+        "amount": None,
+        "currency": None
+    }
+
+    if format_type == InputFormat.JSON:
+        _from_document(identifiers, data.get("data") or {})
+    elif format_type == InputFormat.EMAIL:
+        fields = data.get("fields") or {}
+        sender = parseaddr(fields.get("from", ""))[1]
+        identifiers["sender"] = sender.lower() or None
+        _from_text(identifiers, f"{fields.get('subject', '')}\n{fields.get('body', '')}")
+
+        # Structured attachments are more reliable than the free text
+        for attachment in data.get("attachments", []):
+            attachment_data = (attachment.get("result") or {}).get("data") or {}
+            if attachment.get("agent") == "json":
+                _from_document(identifiers, attachment_data.get("data") or {}, keep_sender=True)
+            elif attachment.get("agent") == "pdf":
+                _from_text(identifiers, attachment_data.get("text", ""))
+    else:
+        _from_text(identifiers, data.get("text", ""))
+
+    return identifiers
+
+
+def _from_document(identifiers: Dict[str, Any], document: Dict[str, Any], keep_sender: bool = False) -> None:
+    """Copy identifiers out of a validated JSON document."""
+    for key in ("invoice_number", "request_id", "currency"):
+        if document.get(key) is not None:
+            identifiers[key] = str(document[key])
+
+    if isinstance(document.get("amount"), (int, float)):
+        identifiers["amount"] = float(document["amount"])
+
+    if not (keep_sender and identifiers["sender"]):
+        for key in SENDER_KEYS:
+            if document.get(key):
+                identifiers["sender"] = str(document[key]).lower()
+                break
+
+
+def _from_text(identifiers: Dict[str, Any], text: str) -> None:
+    """Fill identifiers that are still missing from free text."""
+    if identifiers["invoice_number"] is None:
+        match = INVOICE_NUMBER_PATTERN.search(text)
+        if match:
+            identifiers["invoice_number"] = match.group(1).upper()
+
+    if identifiers["request_id"] is None:
+        match = REQUEST_ID_PATTERN.search(text)
+        if match:
+            identifiers["request_id"] = match.group(1).upper()
+
+    if identifiers["amount"] is None:
+        for match in AMOUNT_PATTERN.finditer(text):
+            try:
+                identifiers["amount"] = float(match.group(2).replace(',', ''))
+            except ValueError:
+                continue
+            if match.group(1) and identifiers["currency"] is None:
+                identifiers["currency"] = CURRENCY_SYMBOLS.get(match.group(1), match.group(1).upper())
+            break
+
+
+def correlate(
+    format_type: InputFormat,
+    identifiers: Dict[str, Any],
+    related: Dict[str, List[str]]
+) -> Dict[str, Any]:
+    """Turn related entry IDs from the memory index into duplicate/follow-up findings."""
+    correlation: Dict[str, Any] = {
+        "related": related,
+        "duplicate_of": [],
+        "follow_up_of": []
+    }
+
+    documents = related.get("invoice_number", [])
+    mentions = [entry_id for entry_id in related.get("mention:invoice_number", []) if entry_id not in documents]
+    if format_type == InputFormat.EMAIL:
+        # An email mentioning a known invoice is a follow-up
+        correlation["follow_up_of"].extend(documents + mentions)
+    elif documents:
+        # Another copy of an invoice document is a duplicate; an earlier email only mentioned it
+        correlation["duplicate_of"].extend(documents)
+    elif not identifiers.get("invoice_number"):
+        # Same sender billing the same amount again without an invoice number
+        correlation["duplicate_of"].extend(related.get("amount", []))
+
+    for entry_id in related.get("request_id", []):
+        if entry_id not in correlation["follow_up_of"]:
+            correlation["follow_up_of"].append(entry_id)
+
+    return correlation
@@ -0,0 +1,35 @@
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+
+class KeywordMatcher:
+    """Keyword table compiled once for repeated substring scoring.
+
+    Keywords shared between categories are only searched for once per
+    text, and category scores are derived from the set of keywords found.
+    Scores keep the category order given at construction, so ties resolve
+    the same way as scoring each category separately.
+    """
+
+    def __init__(self, categories: Dict[Hashable, Iterable[str]]):
+        self.categories: List[Tuple[Hashable, frozenset]] = [
+            (category, frozenset(kw.lower() for kw in keywords))
+            for category, keywords in categories.items()
+        ]
+        # Longest first, so the scan order is stable across processes
+        self.keywords: Tuple[str, ...] = tuple(
+            sorted({kw for _, keywords in self.categories for kw in keywords}, key=lambda kw: (-len(kw), kw))
+        )
+
+    def find(self, text: str) -> frozenset:
+        """Return the keywords present in the already lower-cased text."""
+        return frozenset(kw for kw in self.keywords if kw in text)
+
+    def scores(self, text: str) -> Dict[Hashable, int]:
+        """Count the distinct keywords of each category present in the text."""
+        found = self.find(text.lower())
+        return {category: len(found & keywords) for category, keywords in self.categories}
+
+    def best(self, text: str) -> Hashable:
+        """Return the highest scoring category; ties go to the earliest one."""
+        scores = self.scores(text)
+        return max(scores.items(), key=lambda x: x[1])[0]
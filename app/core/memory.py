@@ -1,56 +1,228 @@
+import heapq
 import json
-from typing import Optional, List, Dict, Any
+import time
+import zlib
+from typing import Optional, List, Dict, Any, Iterable, Tuple, Callable
 import redis
 from datetime import datetime
-from ..models.schemas import MemoryEntry, BaseInput, AgentResponse
+from ..models.schemas import MemoryEntry, BaseInput, AgentResponse, InputFormat
+from .sharding import HashRing
+from .tracing import traced
+
+# Business identifiers that entries are indexed on, see app/core/identifiers.py
+INDEXED_FIELDS = ("invoice_number", "request_id", "sender")
+# Fields that identify a billing document; in emails they are only mentions
+# and are indexed apart, so a mention is never taken for the document itself
+DOCUMENT_FIELDS = ("invoice_number", "amount")
+
+# Raw inputs are kept for reprocessing only: larger ones are not kept, and
+# kept ones expire (0 = keep none / keep forever)
+CONTENT_MAX_BYTES = 1024 * 1024
+CONTENT_TTL = 30 * 24 * 3600
+
+# Shared ring of a ShardedMemoryStore, on its control node
+TOPOLOGY_KEY = "flowbit:topology"
+MIGRATING_KEY = "flowbit:topology:migrating"
 
 class MemoryStore:
-    def __init__(self, redis_url: str = "redis://localhost:6379"):
-        self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+    """Memory entries stored in Redis, spread over hash-tagged partitions.
+
+    Every key belonging to an entry (the entry itself, its slot in the
+    partition's recency list and its identifier index members) carries the
+    partition's hash tag, so they always live on the same Redis node and
+    are written in one transaction. Listing and identifier lookups fan out
+    over the partitions and merge the results.
+    """
+
+    def __init__(
+        self,
+        redis_url: str = "redis://localhost:6379",
+        partitions: int = 1,
+        cluster: bool = False,
+        content_max_bytes: int = CONTENT_MAX_BYTES,
+        content_ttl: int = CONTENT_TTL
+    ):
+        if cluster:
+            self.redis = redis.RedisCluster.from_url(redis_url, decode_responses=True)
+        else:
+            self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
         self.prefix = "flowbit:"
+        self.partitions = partitions
+        self.content_max_bytes = content_max_bytes
+        self.content_ttl = content_ttl
+        # Redis Cluster pipelines cannot use MULTI; keys still share one slot
+        self.transactional = not cluster
 
-    def _get_key(self, key: str) -> str:
-        return f"{self.prefix}{key}"
-
-    def store_entry(self, entry: MemoryEntry) -> str:
-        """Store a new memory entry and return its ID."""
-        key = self._get_key(f"entry:{entry.id}")
-        data = entry.model_dump()
-        data["created_at"] = data["created_at"].isoformat()
-        data["updated_at"] = data["updated_at"].isoformat()
-        data["input_data"] = data["input_data"].model_dump()
-        
-        self.redis.set(key, json.dumps(data))
-        return entry.id
+    def _partition(self, entry_id: str) -> int:
+        return zlib.crc32(entry_id.encode()) % self.partitions
 
-    def get_entry(self, entry_id: str) -> Optional[MemoryEntry]:
-        """Retrieve a memory entry by ID."""
-        key = self._get_key(f"entry:{entry_id}")
-        data = self.redis.get(key)
-        
-        if not data:
-            return None
-            
+    def _get_key(self, key: str, partition: int) -> str:
+        return f"{self.prefix}{{p{partition}}}:{key}"
+
+    def _client(self, partition: int):
+        """Return the Redis client that owns a partition."""
+        return self.redis
+
+    def _read_clients(self, partition: int) -> List[Any]:
+        """Return every client that may hold data for a partition."""
+        return [self._client(partition)]
+
+    def _partitions_by_client(self) -> List[Tuple[Any, List[int]]]:
+        """Group all partitions by the clients that may hold them."""
+        groups: Dict[int, Tuple[Any, List[int]]] = {}
+        for partition in range(self.partitions):
+            for client in self._read_clients(partition):
+                groups.setdefault(id(client), (client, []))[1].append(partition)
+        return list(groups.values())
+
+    def _index_keys(self, identifiers: Dict[str, Any], partition: int, lookup: bool = False) -> Dict[str, str]:
+        """Map each identifier present on an entry to its index key.
+
+        With lookup=True, document fields map to both their document and
+        their mention index, for finding related entries of any format.
+        """
+        values = {}
+        for field in INDEXED_FIELDS:
+            if identifiers.get(field):
+                values[field] = str(identifiers[field]).strip().lower()
+        # Amounts are only meaningful per sender
+        if identifiers.get("sender") and identifiers.get("amount") is not None:
+            values["amount"] = f"{identifiers['sender']}:{float(identifiers['amount']):.2f}"
+
+        mention = identifiers.get("format") == InputFormat.EMAIL.value
+        keys = {}
+        for field, value in values.items():
+            names = [field]
+            if field in DOCUMENT_FIELDS:
+                names = [field, f"mention:{field}"] if lookup else [f"mention:{field}" if mention else field]
+            for name in names:
+                keys[name] = self._get_key(f"index:{name}:{value}", partition)
+        return keys
+
+    def _identifiers(self, entry: MemoryEntry) -> Dict[str, Any]:
+        return entry.input_data.metadata.get("identifiers") or {}
+
+    def _parse_entry(self, data: str) -> MemoryEntry:
         data = json.loads(data)
         # Convert string dates back to datetime
         data["created_at"] = datetime.fromisoformat(data["created_at"])
         data["updated_at"] = datetime.fromisoformat(data["updated_at"])
-        
         return MemoryEntry(**data)
 
+    def ping(self) -> bool:
+        """Check that every node answers."""
+        clients = {id(client): client for client, _ in self._partitions_by_client()}
+        return all(client.ping() for client in clients.values())
+
+    @traced("memory.store_entry")
+    def store_entry(
+        self,
+        entry: MemoryEntry,
+        previous_identifiers: Optional[Dict[str, Any]] = None,
+        content: Optional[str] = None
+    ) -> str:
+        """Store a new memory entry, and optionally its raw input, and return its ID."""
+        partition = self._partition(entry.id)
+        data = entry.model_dump(mode="json")
+        index_keys = self._index_keys(self._identifiers(entry), partition)
+
+        # Write the entry, its recency slot and identifier indexes together
+        pipe = self._client(partition).pipeline(transaction=self.transactional)
+        pipe.set(self._get_key(f"entry:{entry.id}", partition), json.dumps(data))
+        pipe.zadd(self._get_key("entries", partition), {entry.id: entry.created_at.timestamp()})
+        if content is not None and len(content.encode()) <= self.content_max_bytes:
+            # Kept apart from the entry so status reads stay small
+            pipe.set(self._get_key(f"content:{entry.id}", partition), content, ex=self.content_ttl or None)
+        for index_key in index_keys.values():
+            pipe.zadd(index_key, {entry.id: entry.created_at.timestamp()})
+
+        # Drop index memberships for identifiers the entry no longer has
+        if previous_identifiers:
+            stale = set(self._index_keys(previous_identifiers, partition).values()) - set(index_keys.values())
+            for index_key in stale:
+                pipe.zrem(index_key, entry.id)
+
+        pipe.execute()
+        return entry.id
+
+    @traced("memory.find_related")
+    def find_related(
+        self,
+        identifiers: Dict[str, Any],
+        exclude_id: Optional[str] = None,
+        limit: int = 20
+    ) -> Dict[str, List[str]]:
+        """Return the most recent entry IDs sharing each identifier, newest first.
+
+        Emails sharing an invoice number or amount are listed under
+        "mention:invoice_number" / "mention:amount".
+        """
+        fields = list(self._index_keys(identifiers, 0, lookup=True))
+        if not fields:
+            return {}
+
+        # One pipeline per node covering every partition it holds
+        matches: Dict[str, Dict[str, float]] = {field: {} for field in fields}
+        for client, partitions in self._partitions_by_client():
+            pipe = client.pipeline(transaction=False)
+            for partition in partitions:
+                for index_key in self._index_keys(identifiers, partition, lookup=True).values():
+                    pipe.zrevrange(index_key, 0, limit - 1, withscores=True)
+
+            results = iter(pipe.execute())
+            for _ in partitions:
+                for field in fields:
+                    for entry_id, score in next(results):
+                        if entry_id != exclude_id:
+                            matches[field][entry_id] = score
+
+        related = {}
+        for field, scored in matches.items():
+            if scored:
+                newest = heapq.nlargest(limit, scored.items(), key=lambda x: x[1])
+                related[field] = [entry_id for entry_id, _ in newest]
+        return related
+
+    @traced("memory.get_entry")
+    def get_entry(self, entry_id: str) -> Optional[MemoryEntry]:
+        """Retrieve a memory entry by ID."""
+        partition = self._partition(entry_id)
+        key = self._get_key(f"entry:{entry_id}", partition)
+
+        for client in self._read_clients(partition):
+            data = client.get(key)
+            if data:
+                return self._parse_entry(data)
+        return None
+
+    @traced("memory.get_content")
+    def get_content(self, entry_id: str) -> Optional[str]:
+        """Retrieve the raw input an entry was created from, if it was stored."""
+        partition = self._partition(entry_id)
+        key = self._get_key(f"content:{entry_id}", partition)
+
+        for client in self._read_clients(partition):
+            content = client.get(key)
+            if content is not None:
+                return content
+        return None
+
+    @traced("memory.update_entry")
     def update_entry(self, entry_id: str, updates: Dict[str, Any]) -> bool:
         """Update an existing memory entry."""
         entry = self.get_entry(entry_id)
         if not entry:
             return False
 
+        previous_identifiers = dict(self._identifiers(entry))
         for key, value in updates.items():
             setattr(entry, key, value)
-        
+
         entry.updated_at = datetime.now()
-        self.store_entry(entry)
+        self.store_entry(entry, previous_identifiers)
         return True
 
+    @traced("memory.add_agent_response")
     def add_agent_response(self, entry_id: str, response: AgentResponse) -> bool:
         """Add an agent response to an existing entry."""
         entry = self.get_entry(entry_id)
@@ -62,24 +234,84 @@ class MemoryStore:
         self.store_entry(entry)
         return True
 
+    @traced("memory.list_entries")
     def list_entries(self, limit: int = 100) -> List[MemoryEntry]:
-        """List recent memory entries."""
-        keys = self.redis.keys(self._get_key("entry:*"))
+        """List recent memory entries, merged across partitions."""
+        candidates: Dict[str, float] = {}
+        for client, partitions in self._partitions_by_client():
+            pipe = client.pipeline(transaction=False)
+            for partition in partitions:
+                pipe.zrevrange(self._get_key("entries", partition), 0, limit - 1, withscores=True)
+            for members in pipe.execute():
+                candidates.update(members)
+
+        newest = heapq.nlargest(limit, candidates.items(), key=lambda x: x[1])
         entries = []
-        
-        for key in keys[:limit]:
-            data = json.loads(self.redis.get(key))
-            data["created_at"] = datetime.fromisoformat(data["created_at"])
-            data["updated_at"] = datetime.fromisoformat(data["updated_at"])
-            entries.append(MemoryEntry(**data))
-            
+        for entry_id, _ in newest:
+            entry = self.get_entry(entry_id)
+            if entry:
+                entries.append(entry)
+
         return sorted(entries, key=lambda x: x.created_at, reverse=True)
 
+    @traced("memory.scan_entries")
+    def scan_entries(self, cursor: Optional[str] = None, count: int = 100) -> Tuple[List[MemoryEntry], Optional[str]]:
+        """Walk every entry, partition by partition and oldest first, `count` at a time.
+
+        The cursor records a position (partition, created_at, id) rather than
+        an offset, so entries added or deleted during the walk never make it
+        skip or repeat others. Pass the returned cursor back in; None means
+        the walk is complete.
+        """
+        partition, score, last_id = 0, float("-inf"), ""
+        if cursor:
+            p, s, last_id = cursor.split(":", 2)
+            partition, score = int(p), float(s)
+
+        entries: List[MemoryEntry] = []
+        while partition < self.partitions and len(entries) < count:
+            wanted = count - len(entries)
+            members = self._scan_partition(partition, score, last_id, wanted)
+            if members:
+                keys = [self._get_key(f"entry:{entry_id}", partition) for entry_id, _ in members]
+                # The new owner's copy wins while a partition is migrating
+                found: Dict[str, str] = {}
+                for client in self._read_clients(partition):
+                    for (entry_id, _), data in zip(members, client.mget(keys)):
+                        if data and entry_id not in found:
+                            found[entry_id] = data
+                entries.extend(self._parse_entry(found[entry_id]) for entry_id, _ in members if entry_id in found)
+                last_id, score = members[-1]
+
+            if len(members) < wanted:
+                partition, score, last_id = partition + 1, float("-inf"), ""
+
+        if partition >= self.partitions:
+            return entries, None
+        return entries, f"{partition}:{score!r}:{last_id}"
+
+    def _scan_partition(self, partition: int, score: float, last_id: str, count: int) -> List[Tuple[str, float]]:
+        """The next `count` (id, score) members of a partition after a cursor position."""
+        key = self._get_key("entries", partition)
+        merged: Dict[str, float] = {}
+        for client in self._read_clients(partition):
+            # Members tied with the cursor's score may need skipping, so over-fetch until enough remain
+            fetch = count
+            while True:
+                members = client.zrangebyscore(key, score, "+inf", start=0, num=fetch, withscores=True)
+                after = [(m, s) for m, s in members if s > score or m > last_id]
+                if len(after) >= count or len(members) < fetch:
+                    break
+                fetch *= 2
+            merged.update(after)
+        return sorted(merged.items(), key=lambda x: (x[1], x[0]))[:count]
+
+    @traced("memory.search_entries")
     def search_entries(self, query: Dict[str, Any]) -> List[MemoryEntry]:
         """Search memory entries based on criteria."""
         entries = self.list_entries()
         results = []
-        
+
         for entry in entries:
             matches = True
             for key, value in query.items():
@@ -88,10 +320,240 @@ class MemoryStore:
                     break
             if matches:
                 results.append(entry)
-                
+
         return results
 
+    @traced("memory.delete_entry")
     def delete_entry(self, entry_id: str) -> bool:
         """Delete a memory entry."""
-        key = self._get_key(f"entry:{entry_id}")
-        return bool(self.redis.delete(key)) 
\ No newline at end of file
+        partition = self._partition(entry_id)
+        key = self._get_key(f"entry:{entry_id}", partition)
+        entry = self.get_entry(entry_id)
+
+        deleted = False
+        for client in self._read_clients(partition):
+            pipe = client.pipeline(transaction=self.transactional)
+            pipe.delete(key)
+            pipe.delete(self._get_key(f"content:{entry_id}", partition))
+            pipe.zrem(self._get_key("entries", partition), entry_id)
+            if entry:
+                for index_key in self._index_keys(self._identifiers(entry), partition).values():
+                    pipe.zrem(index_key, entry_id)
+            deleted = bool(pipe.execute()[0]) or deleted
+        return deleted
+
+
+class ShardedMemoryStore(MemoryStore):
+    """MemoryStore spread over several independent Redis nodes.
+
+    Partitions are assigned to nodes with a consistent hash ring. Adding or
+    removing a node only reassigns some partitions; until rebalance() has
+    copied them, reads consult both the old and the new owner while writes
+    go to the new owner.
+
+    The topology (ring nodes, the previous ring and the partitions still
+    migrating) is kept on the control node, and every store re-reads it at
+    most every poll_interval seconds. So all workers follow a node change,
+    and a worker started with an outdated REDIS_URL still uses the shared
+    ring.
+    """
+
+    def __init__(
+        self,
+        nodes: Dict[str, Any],
+        partitions: int = 64,
+        replicas: int = 64,
+        control: Any = None,
+        connect: Optional[Callable[[str], Any]] = None,
+        poll_interval: float = 1.0,
+        content_max_bytes: int = CONTENT_MAX_BYTES,
+        content_ttl: int = CONTENT_TTL
+    ):
+        self.nodes = dict(nodes)
+        self.prefix = "flowbit:"
+        self.partitions = partitions
+        self.content_max_bytes = content_max_bytes
+        self.content_ttl = content_ttl
+        self.replicas = replicas
+        self.transactional = True
+        # Holds the topology; it must stay the same when nodes change
+        self.control = control if control is not None else next(iter(self.nodes.values()))
+        self.connect = connect or (lambda url: redis.Redis.from_url(url, decode_responses=True))
+        self.poll_interval = poll_interval
+        self.version = 0
+        self.ring = HashRing(self.nodes, replicas)
+        self.previous_ring: Optional[HashRing] = None
+        self.migrating: set = set()
+        self._checked = float("-inf")
+        self._refresh(force=True)
+
+    @classmethod
+    def from_urls(cls, redis_urls: Iterable[str], **kwargs) -> "ShardedMemoryStore":
+        """Build a store with one node per Redis URL."""
+        nodes = {url: redis.Redis.from_url(url, decode_responses=True) for url in redis_urls}
+        return cls(nodes, **kwargs)
+
+    def _refresh(self, force: bool = False) -> None:
+        """Adopt the shared topology, or publish ours if there is none yet."""
+        now = time.monotonic()
+        if not force and now - self._checked < self.poll_interval:
+            return
+        self._checked = now
+
+        pipe = self.control.pipeline(transaction=True)
+        pipe.hgetall(TOPOLOGY_KEY)
+        pipe.smembers(MIGRATING_KEY)
+        topology, migrating = pipe.execute()
+        if not topology:
+            # First store over these nodes
+            self.control.hset(TOPOLOGY_KEY, mapping={
+                "version": 1, "nodes": json.dumps(self.ring.nodes), "previous": "", "changed_at": time.time()
+            })
+            self.version = 1
+            return
+
+        nodes = json.loads(topology["nodes"])
+        previous = json.loads(topology["previous"]) if topology.get("previous") else []
+        for name in nodes + previous:
+            if name not in self.nodes:
+                self.nodes[name] = self.connect(name)
+        if int(topology["version"]) != self.version:
+            known = set(self.ring.nodes) | set(self.previous_ring.nodes if self.previous_ring else ())
+            self.ring = HashRing(nodes, self.replicas)
+            self.previous_ring = HashRing(previous, self.replicas) if previous else None
+            self.version = int(topology["version"])
+            # Nodes retired by a finished rebalance
+            for name in known.difference(nodes, previous):
+                self.nodes.pop(name, None)
+        self.migrating = {int(partition) for partition in migrating}
+
+    def _owner(self, ring: HashRing, partition: int) -> str:
+        return ring.node_for(f"{{p{partition}}}")
+
+    def _client(self, partition: int):
+        self._refresh()
+        return self.nodes[self._owner(self.ring, partition)]
+
+    def _read_clients(self, partition: int) -> List[Any]:
+        clients = [self._client(partition)]
+        if partition in self.migrating and self.previous_ring is not None:
+            clients.append(self.nodes[self._owner(self.previous_ring, partition)])
+        return clients
+
+    def _reassign(self, nodes: Iterable[str]) -> int:
+        ring = HashRing(nodes, self.replicas)
+        with self.control.pipeline(transaction=True) as pipe:
+            # Fails if another store changes the topology meanwhile
+            pipe.watch(TOPOLOGY_KEY)
+            self._refresh(force=True)
+            if self.previous_ring is not None:
+                raise RuntimeError("Finish rebalancing before changing nodes again")
+            migrating = [
+                partition for partition in range(self.partitions)
+                if self._owner(ring, partition) != self._owner(self.ring, partition)
+            ]
+            pipe.multi()
+            pipe.hset(TOPOLOGY_KEY, mapping={
+                "version": self.version + 1,
+                "nodes": json.dumps(ring.nodes),
+                "previous": json.dumps(self.ring.nodes) if migrating else "",
+                "changed_at": time.time()
+            })
+            pipe.delete(MIGRATING_KEY)
+            if migrating:
+                pipe.sadd(MIGRATING_KEY, *migrating)
+            pipe.execute()
+        self._refresh(force=True)
+        return len(migrating)
+
+    def add_node(self, name: str, client: Any = None) -> int:
+        """Add a node and return how many partitions move to it."""
+        if client is not None:
+            self.nodes[name] = client
+        self._refresh(force=True)
+        return self._reassign(list(self.ring.nodes) + [name])
+
+    def remove_node(self, name: str) -> int:
+        """Retire a node once rebalance() has moved its partitions away."""
+        self._refresh(force=True)
+        return self._reassign([node for node in self.ring.nodes if node != name])
+
+    def rebalance(self, max_partitions: Optional[int] = None, batch_size: int = 500, settle: Optional[float] = None) -> int:
+        """Copy moved partitions to their new owners; returns how many remain.
+
+        Nothing is moved until `settle` seconds (two poll intervals by
+        default) after the node change, so that every store writes to the
+        new owners before keys are deleted from the old ones.
+        """
+        self._refresh(force=True)
+        if self.previous_ring is None:
+            return 0
+        changed_at = float(self.control.hget(TOPOLOGY_KEY, "changed_at") or 0)
+        wait = changed_at + (2 * self.poll_interval if settle is None else settle) - time.time()
+        if wait > 0:
+            time.sleep(wait)
+
+        for partition in sorted(self.migrating)[:max_partitions]:
+            source = self.nodes[self._owner(self.previous_ring, partition)]
+            target = self.nodes[self._owner(self.ring, partition)]
+            self._migrate_partition(partition, source, target, batch_size)
+            self.control.srem(MIGRATING_KEY, partition)
+            self.migrating.discard(partition)
+
+        if not self.migrating:
+            self._finish_rebalance()
+        return len(self.migrating)
+
+    def _finish_rebalance(self) -> None:
+        self.control.hset(TOPOLOGY_KEY, mapping={"version": self.version + 1, "previous": ""})
+        self._refresh(force=True)
+
+    def topology(self) -> Dict[str, Any]:
+        """The shared ring as this store sees it."""
+        self._refresh(force=True)
+        return {
+            "version": self.version,
+            "nodes": list(self.ring.nodes),
+            "previous": list(self.previous_ring.nodes) if self.previous_ring else None,
+            "migrating": len(self.migrating)
+        }
+
+    def _migrate_partition(self, partition: int, source: Any, target: Any, batch_size: int) -> None:
+        """Move every key of a partition, keeping writes made on the new owner."""
+        pattern = self._get_key("*", partition)
+        batch: List[str] = []
+        for key in source.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                self._migrate_keys(batch, source, target)
+                batch = []
+        if batch:
+            self._migrate_keys(batch, source, target)
+
+    def _migrate_keys(self, keys: List[str], source: Any, target: Any) -> None:
+        pipe = source.pipeline(transaction=False)
+        for key in keys:
+            pipe.type(key)
+            pipe.pttl(key)
+        replies = pipe.execute()
+        types, ttls = replies[::2], replies[1::2]
+
+        pipe = source.pipeline(transaction=False)
+        for key, key_type in zip(keys, types):
+            if key_type == "zset":
+                pipe.zrange(key, 0, -1, withscores=True)
+            else:
+                pipe.get(key)
+        values = pipe.execute()
+
+        pipe = target.pipeline(transaction=False)
+        for key, key_type, value, ttl in zip(keys, types, values, ttls):
+            if key_type == "zset":
+                if value:
+                    pipe.zadd(key, dict(value))
+            elif value is not None:
+                # Entries written to the new owner since the move are newer; raw inputs keep their expiry
+                pipe.set(key, value, nx=True, px=ttl if ttl > 0 else None)
+        pipe.execute()
+
+        source.delete(*keys)
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List
+
+ARM_KEY = "flowbit:profile:arm"
+REMAINING_KEY = "flowbit:profile:remaining"
+CAPTURES_KEY = "flowbit:profile:captures"
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Frames from the profiler and exporter threads themselves are never sampled
+OWN_FILES = (os.path.abspath(__file__), os.path.join(APP_ROOT, "core", "tracing.py"))
+
+
+class Capture:
+    """Stack samples collected for one request."""
+
+    def __init__(self, process_id: str, mode: str, task: Optional[asyncio.Task]):
+        self.process_id = process_id
+        self.mode = mode
+        self.task = task
+        self.started = time.time()
+        self.start_perf = time.perf_counter()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def add(self, stack: str) -> None:
+        self.stacks[stack] += 1
+        self.samples += 1
+
+    def to_dict(self, duration_ms: float, interval: float) -> Dict[str, Any]:
+        return {
+            "process_id": self.process_id,
+            "mode": self.mode,
+            "started": self.started,
+            "duration_ms": round(duration_ms, 3),
+            "interval_ms": interval * 1000,
+            "samples": self.samples,
+            "stacks": dict(self.stacks)
+        }
+
+
+class SamplingProfiler:
+    """On-demand sampling profiler for /process requests.
+
+    Idle until armed, either for the next N requests or, for a time window,
+    for requests slower than slow_ms (keeping at most N of them). While a
+    captured request is in flight a background thread samples every thread's
+    stack each `interval` seconds. Event-loop samples are attributed to the
+    request whose task is running; samples from executor threads running
+    app code (PDF extraction, JSON validation) go to every captured request
+    in flight. Stacks are kept folded ("a;b;c count"), ready for
+    flamegraph.pl or speedscope.
+
+    With a Redis client the arm command, the N-request budget and the
+    captures are shared, so arming through any worker profiles all of them.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        interval: float = 0.005,
+        max_captures: int = 50,
+        poll_interval: float = 1.0,
+        max_depth: int = 64
+    ):
+        self.redis = redis_client
+        self.interval = interval
+        self.max_captures = max_captures
+        self.poll_interval = poll_interval
+        self.max_depth = max_depth
+
+        self.command: Optional[Dict[str, Any]] = None
+        self.remaining = 0
+        self.local_captures: deque = deque(maxlen=max_captures)
+        self.active: Dict[Any, Capture] = {}
+        self.loop_thread: Optional[int] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._polled = 0.0
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    def arm(self, requests: int = 10, slow_ms: Optional[float] = None, duration: float = 300.0) -> Dict[str, Any]:
+        """Capture the next `requests` requests, or up to that many slower than slow_ms."""
+        command = {"id": uuid.uuid4().hex, "requests": requests, "slow_ms": slow_ms, "until": time.time() + duration}
+        if self.redis is not None:
+            ttl = max(1, int(duration))
+            self.redis.set(ARM_KEY, json.dumps(command), ex=ttl)
+            self.redis.set(REMAINING_KEY, requests, ex=ttl)
+        self.command, self.remaining = command, requests
+        self._polled = time.monotonic()
+        return command
+
+    def disarm(self) -> None:
+        if self.redis is not None:
+            try:
+                self.redis.delete(ARM_KEY, REMAINING_KEY)
+            except Exception:
+                pass
+        self.command = None
+        self._polled = time.monotonic()
+
+    def _refresh(self) -> Optional[Dict[str, Any]]:
+        """Pick up arm commands issued through other workers, at most once per poll_interval."""
+        now = time.monotonic()
+        if self.redis is not None and now - self._polled >= self.poll_interval:
+            self._polled = now
+            try:
+                raw = self.redis.get(ARM_KEY)
+                self.command = json.loads(raw) if raw else None
+            except Exception:
+                self.command = None
+
+        if self.command is not None and time.time() > self.command["until"]:
+            self.command = None
+        return self.command
+
+    def _claim(self) -> bool:
+        """Take one capture from the armed budget."""
+        if self.redis is not None:
+            try:
+                remaining = self.redis.decr(REMAINING_KEY)
+            except Exception:
+                return False
+        else:
+            self.remaining -= 1
+            remaining = self.remaining
+
+        if remaining <= 0:
+            # Budget spent: stop every worker paying for the check
+            self.disarm()
+        return remaining >= 0
+
+    @contextmanager
+    def capture(self, process_id: str):
+        """Profile the enclosed request if the profiler is armed for it."""
+        command = self._refresh()
+        if command is None or (command["slow_ms"] is None and not self._claim()):
+            yield None
+            return
+
+        task = asyncio.current_task()
+        key = task or threading.get_ident()
+        capture = Capture(process_id, "slow" if command["slow_ms"] is not None else "next", task)
+        self._start(key, capture)
+        try:
+            yield capture
+        finally:
+            with self._lock:
+                self.active.pop(key, None)
+            duration_ms = (time.perf_counter() - capture.start_perf) * 1000
+            if command["slow_ms"] is None or (duration_ms >= command["slow_ms"] and self._claim()):
+                self._save(capture.to_dict(duration_ms, self.interval))
+
+    def _start(self, key: Any, capture: Capture) -> None:
+        if capture.task is not None:
+            self.loop_thread = threading.get_ident()
+            self.loop = capture.task.get_loop()
+        with self._lock:
+            self.active[key] = capture
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+                self._sampler.start()
+
+    def _sample(self) -> None:
+        """Sample thread stacks until no captured request is in flight."""
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self.active:
+                    self._sampler = None
+                    return
+                captures = list(self.active.items())
+
+            running = asyncio.current_task(self.loop) if self.loop is not None else None
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                if thread_id == self.loop_thread:
+                    capture = self.active.get(running)
+                    stack = self._fold(frame, app_only=False) if capture is not None else None
+                    if stack is not None:
+                        capture.add(stack)
+                else:
+                    stack = self._fold(frame, app_only=True)
+                    if stack is not None:
+                        for _, capture in captures:
+                            capture.add(stack)
+            time.sleep(self.interval)
+
+    def _fold(self, frame, app_only: bool) -> Optional[str]:
+        """Fold a stack root-first; None for the profiler's own threads and, with app_only, idle ones."""
+        names: List[str] = []
+        in_app = False
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            filename = code.co_filename
+            if filename in OWN_FILES:
+                return None
+            in_app = in_app or filename.startswith(APP_ROOT)
+            names.append(f"{code.co_name} ({os.path.basename(filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if app_only and not in_app:
+            return None
+        return ";".join(reversed(names))
+
+    def _save(self, capture: Dict[str, Any]) -> None:
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.lpush(CAPTURES_KEY, json.dumps(capture))
+                pipe.ltrim(CAPTURES_KEY, 0, self.max_captures - 1)
+                pipe.execute()
+                return
+            except Exception:
+                pass
+        self.local_captures.appendleft(capture)
+
+    def captures(self) -> List[Dict[str, Any]]:
+        """Saved captures, newest first."""
+        if self.redis is not None:
+            try:
+                return [json.loads(raw) for raw in self.redis.lrange(CAPTURES_KEY, 0, -1)] + list(self.local_captures)
+            except Exception:
+                pass
+        return list(self.local_captures)
+
+    def folded(self, process_id: str) -> Optional[str]:
+        """Collapsed stacks for one capture, one "frame;frame;frame count" per line."""
+        for capture in self.captures():
+            if capture["process_id"] == process_id:
+                return "\n".join(f"{stack} {count}" for stack, count in sorted(capture["stacks"].items()))
+        return None
+
+    def status(self) -> Dict[str, Any]:
+        return {"armed": self._refresh(), "in_flight": len(self.active), "interval_ms": self.interval * 1000}
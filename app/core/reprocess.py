@@ -0,0 +1,262 @@
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Callable
+from .admission import TokenBucket
+from .identifiers import extract_identifiers
+from ..models.schemas import InputFormat, BusinessIntent, AgentResponse, MemoryEntry
+
+# Result data that is not decided by rules, schemas or keywords: history at
+# ingestion time, the routing record (compared separately) and run timestamps
+IGNORED_KEYS = ("correlation", "fraud_signals", "routing", "timestamp")
+# Set afresh on every run wherever they appear, e.g. in an attachment's result
+VOLATILE_KEYS = ("timestamp",)
+
+CHECKPOINT_TTL = 7 * 24 * 3600
+
+
+def outcome(entry_format: InputFormat, intent: BusinessIntent, response: Optional[AgentResponse]) -> Dict[str, Any]:
+    """Flatten what a rule, schema or keyword change can alter about an entry."""
+    if response is None:
+        return {"format": entry_format.value, "intent": intent.value}
+    data = response.data or {}
+    summary = {
+        "format": entry_format.value,
+        "intent": intent.value,
+        "success": response.success,
+        "action": response.next_action,
+        "rule": (data.get("routing") or {}).get("rule")
+    }
+    for key, value in data.items():
+        if key not in IGNORED_KEYS:
+            summary[f"data.{key}"] = _strip_volatile(value)
+    # Compare as stored, so values that only differ in type before serialising match
+    return json.loads(json.dumps(summary, default=str))
+
+
+def _strip_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _strip_volatile(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_strip_volatile(item) for item in value]
+    return value
+
+
+def diff(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, List[Any]]:
+    return {
+        key: [before.get(key), after.get(key)]
+        for key in sorted(set(before) | set(after))
+        if before.get(key) != after.get(key)
+    }
+
+
+class ReprocessJob:
+    """Re-runs classification, agents and routing over every stored entry.
+
+    Entries are walked in batches with MemoryStore.scan_entries. Each batch
+    is shared by `concurrency` workers, then the cursor and counters are
+    checkpointed to Redis, so a stopped job resumes after its last finished
+    batch. A token bucket caps entries per second to leave Redis and CPU to
+    live traffic. Only entries whose outcome changed are written back (the
+    new agent response is appended, actions are not re-run), and every
+    change is recorded for the diff report.
+    """
+
+    COUNTERS = ("scanned", "changed", "unchanged", "no_content", "failed", "conflicts")
+
+    def __init__(
+        self,
+        components,
+        job_id: Optional[str] = None,
+        concurrency: int = 4,
+        rate: float = 20.0,
+        batch_size: int = 100,
+        dry_run: bool = False,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.components = components
+        self.redis = components.control_redis
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.clock = clock
+        self.bucket = TokenBucket(rate, max(1.0, rate), clock()) if rate > 0 else None
+
+        self.key = f"flowbit:reprocess:{self.job_id}"
+        self.diffs_key = f"{self.key}:diffs"
+        self.errors_key = f"{self.key}:errors"
+        self.cursor: Optional[str] = None
+        self.counts: Dict[str, int] = {name: 0 for name in self.COUNTERS}
+        self.done = False
+
+    def resume(self) -> bool:
+        """Load the job's last checkpoint; False if there is none."""
+        state = self.redis.hgetall(self.key)
+        if not state:
+            return False
+        self.cursor = state.get("cursor") or None
+        self.done = state.get("status") == "done"
+        # A job keeps the mode it was started in
+        self.dry_run = state.get("dry_run") == "1"
+        for name in self.COUNTERS:
+            self.counts[name] = int(state.get(name, 0))
+        return True
+
+    def _checkpoint(self, status: str) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(self.key, mapping={"cursor": self.cursor or "", "status": status, "dry_run": int(self.dry_run), **self.counts})
+        pipe.expire(self.key, CHECKPOINT_TTL)
+        pipe.expire(self.diffs_key, CHECKPOINT_TTL)
+        pipe.expire(self.errors_key, CHECKPOINT_TTL)
+        pipe.execute()
+
+    async def _throttle(self) -> None:
+        if self.bucket is None:
+            return
+        while True:
+            wait = self.bucket.take(self.clock())
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    async def run(self, max_entries: Optional[int] = None) -> Dict[str, Any]:
+        """Process entries until the walk completes (or max_entries more are scanned)."""
+        store = self.components.memory_store
+        scanned = 0
+        while not self.done and (max_entries is None or scanned < max_entries):
+            count = self.batch_size if max_entries is None else min(self.batch_size, max_entries - scanned)
+            entries, cursor = await asyncio.to_thread(store.scan_entries, self.cursor, count)
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def work(entry: MemoryEntry) -> None:
+                async with semaphore:
+                    await self._throttle()
+                    await self._reprocess(entry)
+
+            await asyncio.gather(*(work(entry) for entry in entries))
+            scanned += len(entries)
+            self.cursor, self.done = cursor, cursor is None
+            await asyncio.to_thread(self._checkpoint, "done" if self.done else "running")
+
+        return self.report()
+
+    async def _analyze(self, content: str, source: Optional[str]):
+        """The ingestion pipeline up to routing, without stats, storage or actions."""
+        components = self.components
+        format_type, intent_type, _ = await components.classifier.classify(content)
+        if format_type == InputFormat.EMAIL:
+            result = await components.email_agent.process(content)
+        elif format_type == InputFormat.JSON:
+            result = await asyncio.to_thread(components.json_agent.process, content)
+        else:  # PDF
+            result = await components.pdf_agent.process(content)
+        return format_type, intent_type, result, extract_identifiers(format_type, result, source)
+
+    async def _reprocess(self, entry: MemoryEntry) -> None:
+        store = self.components.memory_store
+        self.counts["scanned"] += 1
+        try:
+            content = await asyncio.to_thread(store.get_content, entry.id)
+            if content is None:
+                # Too large to keep, expired, or stored before raw inputs were kept
+                self.counts["no_content"] += 1
+                return
+
+            previous = entry.agent_responses[-1] if entry.agent_responses else None
+            previous_data = (previous.data if previous else None) or {}
+            old_identifiers = dict(entry.input_data.metadata.get("identifiers") or {})
+            # A source that defaulted to the old format is not a real source
+            source = entry.input_data.source if entry.input_data.source != entry.input_data.format.value else None
+
+            format_type, intent_type, result, identifiers = await self._analyze(content, source)
+
+            # Signals from sender history and correlation are kept as recorded
+            historical = {k: previous_data[k] for k in ("fraud_signals", "correlation") if k in previous_data}
+            if historical.get("fraud_signals"):
+                intent_type = BusinessIntent.FRAUD_RISK
+            result.data = {**(result.data or {}), **historical}
+
+            decision = self.components.decision_table.decide(format_type, intent_type, result)
+            result.data["routing"] = {"rule": decision.rule, "agent_action": result.next_action}
+            result.next_action = decision.action
+
+            changes = diff(
+                outcome(entry.input_data.format, entry.input_data.intent, previous),
+                outcome(format_type, intent_type, result)
+            )
+            if not changes:
+                self.counts["unchanged"] += 1
+                return
+
+            if not self.dry_run:
+                written = await asyncio.to_thread(
+                    self._write_back, entry, format_type, intent_type, result, identifiers, old_identifiers
+                )
+                if not written:
+                    self.counts["conflicts"] += 1
+                    return
+
+            self.counts["changed"] += 1
+            record = {"id": entry.id, "created_at": entry.created_at.isoformat(), "changes": changes}
+            await asyncio.to_thread(self.redis.rpush, self.diffs_key, json.dumps(record, default=str))
+        except Exception as e:
+            self.counts["failed"] += 1
+            error = {"id": entry.id, "error": f"{type(e).__name__}: {e}"}
+            await asyncio.to_thread(self.redis.rpush, self.errors_key, json.dumps(error))
+
+    def _write_back(
+        self,
+        entry: MemoryEntry,
+        format_type: InputFormat,
+        intent_type: BusinessIntent,
+        result: AgentResponse,
+        identifiers: Dict[str, Any],
+        old_identifiers: Dict[str, Any]
+    ) -> bool:
+        """Store the new outcome unless the entry was modified since it was read."""
+        store = self.components.memory_store
+        current = store.get_entry(entry.id)
+        if current is None or current.updated_at != entry.updated_at:
+            return False
+
+        metadata = dict(current.input_data.metadata)
+        metadata["identifiers"] = identifiers
+        metadata["reprocessed"] = {"job_id": self.job_id, "at": datetime.now().isoformat()}
+        current.input_data = current.input_data.model_copy(update={
+            "source": identifiers["source"],
+            "format": format_type,
+            "intent": intent_type,
+            "metadata": metadata
+        })
+        current.agent_responses.append(result)
+        current.updated_at = datetime.now()
+        store.store_entry(current, old_identifiers)
+        return True
+
+    def report(self) -> Dict[str, Any]:
+        """Counters, every recorded change and error, and per-field transition counts."""
+        changes = [json.loads(raw) for raw in self.redis.lrange(self.diffs_key, 0, -1)]
+        by_field: Dict[str, Dict[str, int]] = {}
+        for record in changes:
+            for field, (before, after) in record["changes"].items():
+                if field.startswith("data."):
+                    transition = "changed"
+                else:
+                    transition = f"{before} -> {after}"
+                by_field.setdefault(field, {})
+                by_field[field][transition] = by_field[field].get(transition, 0) + 1
+
+        return {
+            "job_id": self.job_id,
+            "complete": self.done,
+            "dry_run": self.dry_run,
+            "cursor": self.cursor,
+            "counts": dict(self.counts),
+            "changes_by_field": by_field,
+            "changes": changes,
+            "errors": [json.loads(raw) for raw in self.redis.lrange(self.errors_key, 0, -1)]
+        }
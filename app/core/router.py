@@ -1,19 +1,18 @@
 from typing import Dict, Any, Optional
 import httpx
 from ..models.schemas import AgentResponse, MemoryEntry
+from .tracing import span, traced
+
+# Actions with a handler, each implemented by ActionRouter._handle_<action>
+ACTIONS = ("create_ticket", "escalate_issue", "flag_compliance", "log_alert", "generate_summary")
 
 class ActionRouter:
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url
         self.client = httpx.AsyncClient(base_url=base_url)
-        self.action_handlers = {
-            "create_ticket": self._handle_create_ticket,
-            "escalate_issue": self._handle_escalate_issue,
-            "flag_compliance": self._handle_flag_compliance,
-            "log_alert": self._handle_log_alert,
-            "generate_summary": self._handle_generate_summary
-        }
+        self.action_handlers = {action: getattr(self, f"_handle_{action}") for action in ACTIONS}
 
+    @traced("action.route")
     async def route_action(self, entry: MemoryEntry) -> AgentResponse:
         """Route and execute the appropriate action based on agent responses."""
         if not entry.agent_responses:
@@ -44,7 +43,8 @@ class ActionRouter:
 
         try:
             # Execute the action
-            result = await handler(entry)
+            with span(f"action.{latest_response.next_action}", base_url=self.base_url):
+                result = await handler(entry)
             return AgentResponse(
                 success=True,
                 message=f"Successfully executed {latest_response.next_action}",
@@ -0,0 +1,49 @@
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Tuple
+
+
+def hash_tag(key: str) -> str:
+    """Return the part of a key Redis Cluster hashes on ({...} if present)."""
+    start = key.find("{")
+    if start != -1:
+        end = key.find("}", start + 1)
+        if end > start + 1:
+            return key[start + 1:end]
+    return key
+
+
+class HashRing:
+    """Consistent hash ring mapping keys onto node names.
+
+    Each node is placed at `replicas` points on the ring, so adding or
+    removing a node only moves the keys between it and its neighbours.
+    Keys are hashed on their hash tag, like Redis Cluster slots.
+    """
+
+    def __init__(self, nodes: Iterable[str], replicas: int = 64):
+        self.replicas = replicas
+        self.nodes = sorted(set(nodes))
+        if not self.nodes:
+            raise ValueError("HashRing needs at least one node")
+
+        points: List[Tuple[int, str]] = []
+        for node in self.nodes:
+            for i in range(replicas):
+                points.append((self._hash(f"{node}#{i}"), node))
+        points.sort()
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def node_for(self, key: str) -> str:
+        """Return the node that owns a key."""
+        i = bisect.bisect(self._hashes, self._hash(hash_tag(key)))
+        return self._owners[i % len(self._owners)]
+
+    def assignments(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Map each key to its owning node."""
+        return {key: self.node_for(key) for key in keys}
@@ -0,0 +1,219 @@
+import math
+import time
+from typing import Optional, List, Dict, Any
+import redis
+
+
+class StatisticsEngine:
+    """Sliding-window per-sender and per-source aggregates kept in Redis.
+
+    Each subject (a sender or a source) owns one small hash per time bucket
+    holding counters and running sums, so recording a document and scoring
+    it against the window touches a fixed number of keys regardless of how
+    much history exists. Buckets expire on their own once they leave the
+    window, as do the per-bucket sets of senders seen on each source and
+    each sender's last currency.
+    """
+
+    def __init__(
+        self,
+        redis_url: str = "redis://localhost:6379",
+        window_seconds: int = 24 * 3600,
+        bucket_seconds: int = 3600,
+        min_samples: int = 5,
+        z_threshold: float = 3.0,
+        rate_factor: float = 3.0,
+        new_payee_limit: int = 5,
+        cluster: bool = False
+    ):
+        if cluster:
+            self.redis = redis.RedisCluster.from_url(redis_url, decode_responses=True)
+        else:
+            self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+        self.prefix = "flowbit:stats:"
+        # Redis Cluster pipelines cannot use MULTI
+        self.transactional = not cluster
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = max(1, window_seconds // bucket_seconds)
+        self.min_samples = min_samples
+        self.z_threshold = z_threshold
+        self.rate_factor = rate_factor
+        self.new_payee_limit = new_payee_limit
+
+    def _get_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _bucket_keys(self, subject: str, bucket: int) -> List[str]:
+        return [
+            self._get_key(f"{subject}:{b}")
+            for b in range(bucket - self.window_buckets + 1, bucket + 1)
+        ]
+
+    def window(self, subject: str, now: Optional[float] = None) -> Dict[str, float]:
+        """Return the aggregates of a subject over the current window."""
+        bucket = int((now or time.time()) // self.bucket_seconds)
+        pipe = self.redis.pipeline(transaction=False)
+        for key in self._bucket_keys(subject, bucket):
+            pipe.hgetall(key)
+        return self._aggregate(pipe.execute())
+
+    def _aggregate(self, buckets: List[Dict[str, str]]) -> Dict[str, float]:
+        """Sum per-bucket hashes; the last bucket is the current one."""
+        totals: Dict[str, float] = {
+            "count": 0.0, "amount_count": 0.0, "amount_sum": 0.0, "amount_sumsq": 0.0,
+            "new_payees": 0.0, "currency_changes": 0.0
+        }
+        for values in buckets:
+            for field, value in values.items():
+                totals[field] = totals.get(field, 0.0) + float(value)
+        current = buckets[-1] if buckets else {}
+        totals["current_count"] = float(current.get("count", 0))
+        totals["current_new_payees"] = float(current.get("new_payees", 0))
+        return totals
+
+    def _ttl(self) -> int:
+        """Seconds a bucket stays readable: the window plus the bucket being filled."""
+        return (self.window_buckets + 1) * self.bucket_seconds
+
+    def _baseline(self, total: float, current: float) -> float:
+        """Average per-bucket value over the window, excluding the current bucket."""
+        if self.window_buckets == 1:
+            return 0.0
+        return (total - current) / (self.window_buckets - 1)
+
+    def observe(
+        self,
+        sender: Optional[str],
+        source: Optional[str],
+        amount: Optional[float] = None,
+        currency: Optional[str] = None,
+        now: Optional[float] = None,
+        invoice_number: Optional[str] = None
+    ) -> List[str]:
+        """Score a document against its sender/source window, record it and return fraud signals.
+
+        `source` is the submitting channel when the caller named one. Burst and
+        new-sender signals only apply to documents that bill something (an
+        amount or an invoice number); ordinary correspondence is only counted.
+        """
+        bucket = int((now or time.time()) // self.bucket_seconds)
+        billing = amount is not None or bool(invoice_number)
+        source_subject = f"source:{source}" if source else None
+        subjects = ([source_subject] if source_subject else []) + ([f"sender:{sender}"] if sender else [])
+        if not subjects:
+            return []
+        track_payee = billing and bool(sender) and bool(source)
+
+        # Read the window and the sender state in one round trip
+        pipe = self.redis.pipeline(transaction=False)
+        for subject in subjects:
+            for key in self._bucket_keys(subject, bucket):
+                pipe.hgetall(key)
+        if sender:
+            pipe.get(self._get_key(f"sender:{sender}:currency"))
+        if track_payee:
+            # A sender is new to a source if no bucket of the window has seen it
+            payee_keys = self._bucket_keys(f"source:{source}:payees", bucket)
+            for key in payee_keys[:-1]:
+                pipe.sismember(key, sender)
+            pipe.sadd(payee_keys[-1], sender)
+            pipe.expire(payee_keys[-1], self._ttl())
+        results = pipe.execute()
+
+        windows = {}
+        for i, subject in enumerate(subjects):
+            start = i * self.window_buckets
+            windows[subject] = self._aggregate(results[start:start + self.window_buckets])
+
+        signals = []
+        last_currency, is_new_payee = None, False
+        reads = results[len(subjects) * self.window_buckets:]
+        if sender:
+            last_currency = reads[0]
+        if track_payee:
+            payees = reads[1:1 + self.window_buckets]
+            # Added to the current bucket and absent from the earlier ones
+            is_new_payee = bool(payees[-1]) and not any(payees[:-1])
+        if sender:
+            sender_window = windows[f"sender:{sender}"]
+
+            # Amount far outside the sender's usual range
+            if amount is not None and sender_window["amount_count"] >= self.min_samples:
+                n = sender_window["amount_count"]
+                mean = sender_window["amount_sum"] / n
+                variance = max(sender_window["amount_sumsq"] / n - mean * mean, 0.0)
+                std = max(math.sqrt(variance), abs(mean) * 0.01, 1e-9)
+                z_score = (amount - mean) / std
+                if abs(z_score) > self.z_threshold:
+                    signals.append(
+                        f"Amount {amount:.2f} deviates {z_score:.1f} standard deviations "
+                        f"from sender mean {mean:.2f}"
+                    )
+
+            # Currency switch after an established history
+            if (currency and last_currency and currency != last_currency
+                    and sender_window["count"] >= self.min_samples):
+                signals.append(f"Sender currency changed from {last_currency} to {currency}")
+
+        # Sudden submission bursts compared to the rest of the window
+        for subject in (subjects if billing else []):
+            subject_window = windows[subject]
+            history = subject_window["count"] - subject_window["current_count"]
+            current = subject_window["current_count"] + 1
+            baseline = self._baseline(subject_window["count"], subject_window["current_count"])
+            if (history >= self.min_samples and current >= self.min_samples
+                    and current > self.rate_factor * max(baseline, 1.0)):
+                signals.append(f"Submission burst for {subject}: {int(current)} in the current interval")
+
+        # Many first-time senders on one source compared to its usual intake
+        if is_new_payee:
+            source_window = windows[source_subject]
+            history = source_window["count"] - source_window["current_count"]
+            current = source_window["current_new_payees"] + 1
+            baseline = self._baseline(source_window["new_payees"], source_window["current_new_payees"])
+            if (history >= self.min_samples and current > self.new_payee_limit
+                    and current > self.rate_factor * max(baseline, 1.0)):
+                signals.append(f"Burst of {int(current)} new senders on source:{source} in the current interval")
+
+        self._record(subjects, bucket, amount, currency, last_currency, is_new_payee, sender, source_subject)
+        return signals
+
+    def _record(
+        self,
+        subjects: List[str],
+        bucket: int,
+        amount: Optional[float],
+        currency: Optional[str],
+        last_currency: Optional[str],
+        is_new_payee: bool,
+        sender: Optional[str],
+        source_subject: Optional[str]
+    ) -> None:
+        """Fold a document into the current bucket of each subject."""
+        ttl = self._ttl()
+        pipe = self.redis.pipeline(transaction=self.transactional)
+
+        for subject in subjects:
+            key = self._get_key(f"{subject}:{bucket}")
+            pipe.hincrby(key, "count", 1)
+            if amount is not None:
+                pipe.hincrbyfloat(key, "amount_count", 1)
+                pipe.hincrbyfloat(key, "amount_sum", amount)
+                pipe.hincrbyfloat(key, "amount_sumsq", amount * amount)
+            pipe.expire(key, ttl)
+
+        if is_new_payee:
+            pipe.hincrby(self._get_key(f"{source_subject}:{bucket}"), "new_payees", 1)
+        if sender and currency:
+            if last_currency and currency != last_currency:
+                pipe.hincrby(self._get_key(f"sender:{sender}:{bucket}"), "currency_changes", 1)
+            pipe.set(self._get_key(f"sender:{sender}:currency"), currency, ex=ttl)
+
+        pipe.execute()
+
+    def snapshot(self, sender: Optional[str], source: Optional[str], now: Optional[float] = None) -> Dict[str, Any]:
+        """Return the current window aggregates for a sender and source."""
+        snapshot = {"source": self.window(f"source:{source}", now)} if source else {}
+        if sender:
+            snapshot["sender"] = self.window(f"sender:{sender}", now)
+        return snapshot
@@ -0,0 +1,294 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List
+
+# The span the current request (or thread it handed work to) is inside of
+_current_span: contextvars.ContextVar = contextvars.ContextVar("flowbit_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Encode the span as OTLP/JSON."""
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Trace:
+    """Spans recorded for one request; exported together when the root ends."""
+
+    __slots__ = ("trace_id", "sampled", "spans")
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List[Span] = []
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def trace_id_for(process_id: str) -> str:
+    """Derive the 16-byte trace ID from a process ID, so one can be found from the other."""
+    try:
+        return uuid.UUID(process_id).hex
+    except ValueError:
+        return os.urandom(16).hex()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """Record a child span of the current span; a no-op outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end_ns = time.time_ns()
+        _current_span.reset(token)
+        # list.append is atomic, so spans may also end in worker threads
+        parent.trace.spans.append(child)
+
+
+def traced(name: str):
+    """Decorator recording a span around each call made inside a trace."""
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return await func(*args, **kwargs)
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def otlp_payload(spans: List[Span], service_name: str) -> Dict[str, Any]:
+    """Wrap spans in an OTLP/JSON ExportTraceServiceRequest."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+            "scopeSpans": [{"scope": {"name": "flowbit"}, "spans": [s.to_otlp() for s in spans]}]
+        }]
+    }
+
+
+class FileExporter:
+    """Append OTLP/JSON export requests to a file, one per line.
+
+    This is the format the OpenTelemetry collector's file exporter writes,
+    so the file can be replayed into a collector or read by scripts/traces.py.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, payload: Dict[str, Any]) -> None:
+        with open(self.path, "a") as f:
+            f.write(json.dumps(payload, separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        pass
+
+
+class OtlpHttpExporter:
+    """POST OTLP/JSON export requests to a collector's /v1/traces endpoint."""
+
+    def __init__(self, endpoint: str, timeout: float = 2.0):
+        import httpx
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.client = httpx.Client(timeout=timeout)
+
+    def export(self, payload: Dict[str, Any]) -> None:
+        self.client.post(self.url, json=payload).raise_for_status()
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def exporter_from_spec(spec: str):
+    """Build an exporter from "file:<path>" or "otlp:<collector url>"."""
+    kind, _, target = spec.partition(":")
+    if kind == "file":
+        return FileExporter(target)
+    if kind == "otlp":
+        return OtlpHttpExporter(target)
+    raise ValueError(f"Unknown trace exporter: {spec}")
+
+
+class Tracer:
+    """Starts request traces and exports them off the request path.
+
+    Traces are kept with probability sample_rate, plus every trace slower
+    than slow_ms whatever the sample says. Finished traces are handed to a
+    bounded queue drained by one background thread; when the queue is full
+    traces are dropped rather than slowing requests down.
+    """
+
+    def __init__(
+        self,
+        exporter=None,
+        sample_rate: float = 1.0,
+        slow_ms: Optional[float] = None,
+        service_name: str = "flowbit",
+        max_queue: int = 1000,
+        batch_size: int = 64
+    ):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.queue: "queue.Queue[Optional[List[Span]]]" = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.failed = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def trace(self, name: str, process_id: str, **attributes: Any):
+        """Record a root span for one request and export its trace when it ends."""
+        if not self.enabled:
+            yield None
+            return
+
+        trace = Trace(trace_id_for(process_id), random.random() < self.sample_rate)
+        root = Span(trace, name, None, {"process_id": process_id, **attributes})
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            root.end_ns = time.time_ns()
+            _current_span.reset(token)
+            trace.spans.append(root)
+            if trace.sampled or (self.slow_ms is not None and root.duration_ms >= self.slow_ms):
+                self._enqueue(trace.spans)
+
+    def _enqueue(self, spans: List[Span]) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._drain, name="trace-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self.queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self) -> None:
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return
+            # Coalesce up to batch_size waiting traces into one export request
+            batch, stop = list(first), False
+            for _ in range(self.batch_size - 1):
+                try:
+                    more = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    stop = True
+                    break
+                batch.extend(more)
+            self._export(batch)
+            if stop:
+                return
+
+    def _export(self, spans: List[Span]) -> None:
+        try:
+            self.exporter.export(otlp_payload(spans, self.service_name))
+        except Exception:
+            self.failed += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush queued traces and stop the exporter thread."""
+        if self._thread is not None:
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+            self._thread = None
+        if self.exporter is not None:
+            self.exporter.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "slow_ms": self.slow_ms,
+            "queued": self.queue.qsize(),
+            "dropped": self.dropped,
+            "failed": self.failed
+        }
@@ -1,42 +1,176 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, Request, UploadFile, File, Form, Header, HTTPException, Depends, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import asyncio
+import gc
 import json
+import logging
+import secrets
+import time
 import uuid
-from typing import Optional
+from typing import Optional, Dict, Any, List, Set, Tuple
 import os
 from dotenv import load_dotenv
 
-from .agents.classifier import ClassifierAgent
-from .agents.email_agent import EmailAgent
-from .agents.json_agent import JsonAgent
-from .agents.pdf_agent import PdfAgent
-from .core.memory import MemoryStore
-from .core.router import ActionRouter
-from .models.schemas import InputFormat, BusinessIntent, AgentResponse
+from .core.admission import AdmissionRejected
+from .core.components import Components
+from .core.events import Subscription, SubscriptionRejected, TERMINAL_STATUSES
+from .core.identifiers import extract_identifiers, correlate
+from .core.tracing import span
+from .models.schemas import InputFormat, BusinessIntent, AgentResponse, BaseInput, MemoryEntry
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="Multi-Format AI System")
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-# Initialize components
-classifier = ClassifierAgent()
-email_agent = EmailAgent()
-json_agent = JsonAgent()
-pdf_agent = PdfAgent()
-memory_store = MemoryStore()
-action_router = ActionRouter()
+# Components are built lazily; with FLOWBIT_PRELOAD=1 (e.g. under
+# gunicorn --preload) they are built here, in the master process, and
+# frozen out of the GC so forked workers keep sharing their pages
+components = Components()
+if os.getenv("FLOWBIT_PRELOAD") == "1":
+    components.preload()
+    gc.freeze()
+
+@app.on_event("startup")
+async def warm_up():
+    """Build any components the master did not preload, off the event loop."""
+    if not components.preloaded:
+        future = asyncio.get_running_loop().run_in_executor(None, components.preload)
+        future.add_done_callback(report_preload_failure)
+
+def report_preload_failure(future: asyncio.Future) -> None:
+    """Log a failed warm-up; /ready stays 503 and shows the error."""
+    if future.cancelled() or future.exception() is None:
+        return
+    error = future.exception()
+    components.preload_error = f"{type(error).__name__}: {error}"
+    logger.error("Building components failed", exc_info=error)
+
+@app.on_event("shutdown")
+async def shut_down():
+    """Close network clients."""
+    await components.close()
+
+async def run_pipeline(process_id: str, content: str, source: Optional[str]) -> str:
+    """Classify, process, correlate, store and route one document; returns the action taken."""
+    components.status_hub.publish(process_id, "processing")
+
+    # Classify input
+    with span("classify") as stage:
+        format_type, intent_type, confidence = await components.classifier.classify(content)
+        if stage:
+            stage.set(format=format_type.value, intent=intent_type.value)
+    
+    # Process with appropriate agent
+    with span(f"agent.{format_type.value}"):
+        if format_type == InputFormat.EMAIL:
+            result = await components.email_agent.process(content)
+        elif format_type == InputFormat.JSON:
+            result = components.json_agent.process(content)
+        else:  # PDF
+            result = await components.pdf_agent.process(content)
+
+    # Score the document against its sender/source history
+    identifiers = extract_identifiers(format_type, result, source)
+    with span("stats.observe"):
+        fraud_signals = components.stats_engine.observe(
+            identifiers["sender"],
+            # A source defaulted from the format is every document of that format, not a channel
+            source,
+            amount=identifiers["amount"],
+            currency=identifiers["currency"],
+            invoice_number=identifiers["invoice_number"]
+        )
+    if fraud_signals:
+        intent_type = BusinessIntent.FRAUD_RISK
+        result.data = {**(result.data or {}), "fraud_signals": fraud_signals}
+
+    # Link the document to earlier entries sharing its identifiers
+    correlation = correlate(format_type, identifiers, components.memory_store.find_related(identifiers))
+    result.data = {**(result.data or {}), "correlation": correlation}
+
+    # Pick the next action from the routing rule table
+    with span("decide") as stage:
+        decision = components.decision_table.decide(format_type, intent_type, result)
+        if stage:
+            stage.set(rule=decision.rule, action=decision.action)
+    result.data["routing"] = {"rule": decision.rule, "agent_action": result.next_action}
+    result.next_action = decision.action
+        
+    # Store result in memory
+    entry = MemoryEntry(
+        id=process_id,
+        input_data=BaseInput(
+            source=identifiers["source"],
+            format=format_type,
+            intent=intent_type,
+            metadata={"confidence": confidence, "identifiers": identifiers}
+        ),
+        agent_responses=[result]
+    )
+    components.memory_store.store_entry(entry, content=content)
+    components.status_hub.publish(
+        process_id, "routed", format=format_type.value, intent=intent_type.value, next_action=result.next_action
+    )
+    
+    # Route to next action
+    action_result = await components.action_router.route_action(entry)
+    status = "completed" if action_result.success else "action_failed"
+    components.memory_store.update_entry(process_id, {
+        "status": status,
+        "action_taken": result.next_action
+    })
+    components.status_hub.publish(process_id, status, action_taken=result.next_action, action={
+        "success": action_result.success,
+        "message": action_result.message,
+        "error": action_result.error
+    })
+
+    return result.next_action
+
+async def run_admitted(process_id: str, content: str, source: Optional[str], priority, queued_ms: float) -> str:
+    """Run the pipeline in an admission slot already taken, releasing it when done."""
+    started = time.perf_counter()
+    try:
+        with components.tracer.trace("process", process_id, source=source, priority=priority.name.lower(),
+                                     queued_ms=queued_ms), \
+                components.profiler.capture(process_id):
+            return await run_pipeline(process_id, content, source)
+    except Exception as e:
+        components.status_hub.publish(process_id, "failed", error=str(e))
+        raise
+    finally:
+        components.admission.release(time.perf_counter() - started)
+
+# Pipelines of background requests, referenced until they finish
+background_runs: Set[asyncio.Task] = set()
+
+async def run_in_background(process_id: str, content: str, source: Optional[str], priority, queued_ms: float):
+    """Run an accepted request after its response was sent; failures reach subscribers as events."""
+    try:
+        await run_admitted(process_id, content, source, priority, queued_ms)
+    except Exception:
+        pass
 
 @app.post("/process")
 async def process_input(
+    request: Request,
     content: Optional[str] = Form(None),
-    file: Optional[UploadFile] = File(None)
+    file: Optional[UploadFile] = File(None),
+    source: Optional[str] = Form(None),
+    background: bool = Form(False)
 ):
-    """Process input from various sources."""
+    """Process input from various sources.
+
+    With background=true the request returns 202 once admitted; follow it
+    on /events or /ws/events instead of polling /status.
+    """
     try:
         # Generate process ID
         process_id = str(uuid.uuid4())
@@ -48,28 +182,28 @@ async def process_input(
         elif not content:
             raise HTTPException(status_code=400, detail="No content provided")
             
-        # Classify input
-        format_type, intent_type, confidence = await classifier.classify(content)
-        
-        # Process with appropriate agent
-        if format_type == InputFormat.EMAIL:
-            result = await email_agent.process(content)
-        elif format_type == InputFormat.JSON:
-            result = await json_agent.process(content)
-        else:  # PDF
-            result = await pdf_agent.process(content)
-            
-        # Store result in memory
-        memory_store.store(process_id, {
-            "format": format_type.value,
-            "intent": intent_type.value,
-            "confidence": confidence,
-            "result": result.dict()
-        })
-        
-        # Route to next action
-        next_action = action_router.route(result)
-        
+        # Cheap early signals decide queue priority before any agent runs
+        admission = components.admission
+        priority = admission.priority_for(content, source)
+        queued = time.perf_counter()
+        # Rate limited per peer address: unlike the source, the client cannot pick it
+        await admission.acquire(priority, request.client.host if request.client else "anonymous")
+        queued_ms = (time.perf_counter() - queued) * 1000
+
+        if background:
+            components.status_hub.publish(process_id, "accepted")
+            task = asyncio.create_task(run_in_background(process_id, content, source, priority, queued_ms))
+            background_runs.add(task)
+            task.add_done_callback(background_runs.discard)
+            return JSONResponse({
+                "process_id": process_id,
+                "status": "accepted",
+                "message": "Processing started",
+                "events": f"/events?ids={process_id}"
+            }, status_code=202)
+
+        next_action = await run_admitted(process_id, content, source, priority, queued_ms)
+
         return JSONResponse({
             "process_id": process_id,
             "status": "success",
@@ -77,6 +211,14 @@ async def process_input(
             "next_action": next_action
         })
         
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Request rejected: {e.reason}",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -84,20 +226,254 @@ async def process_input(
 async def get_status(process_id: str):
     """Get the status of a processing request."""
     try:
-        result = memory_store.retrieve(process_id)
-        if not result:
+        entry = components.memory_store.get_entry(process_id)
+        if not entry:
+            # Requests that failed before being stored only have their last status event
+            recorded = components.status_hub.recorded([process_id])
+            if recorded:
+                return JSONResponse(json.loads(recorded[0][2]))
             raise HTTPException(status_code=404, detail="Process not found")
             
-        return JSONResponse(result)
+        return JSONResponse(entry.model_dump(mode="json"))
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def recorded_statuses(process_ids: List[str]) -> List[Tuple[str, bool, str]]:
+    """Statuses already stored, so a subscriber that connects late still sees where each request is."""
+    events = components.status_hub.recorded(process_ids)
+    # Entries processed before their events were recorded, or whose record expired
+    recorded = {process_id for process_id, _, _ in events}
+    for process_id in process_ids:
+        if process_id in recorded:
+            continue
+        entry = components.memory_store.get_entry(process_id)
+        if entry:
+            event = {"process_id": process_id, "status": entry.status, "action_taken": entry.action_taken, "snapshot": True}
+            events.append((process_id, entry.status in TERMINAL_STATUSES, json.dumps(event)))
+    return events
+
+async def status_messages(subscription: Subscription, process_ids: List[str]):
+    """Yield (event, data) for the recorded then live statuses of a subscription; (None, None) on heartbeats.
+
+    Ends once every requested process ID has reached a terminal status.
+    """
+    pending = set(process_ids)
+    events = await asyncio.to_thread(recorded_statuses, process_ids)
+    while pending and not subscription.closed:
+        for process_id, terminal, raw in events:
+            yield "status", raw
+            if terminal:
+                pending.discard(process_id)
+        if not pending:
+            break
+
+        events = await subscription.get()
+        dropped = subscription.take_dropped()
+        if dropped:
+            # Missed transitions are replaced by the current state
+            yield "lagged", json.dumps({"dropped": dropped})
+            events += await asyncio.to_thread(recorded_statuses, sorted(pending))
+        elif not events:
+            yield None, None
+
+async def open_subscription(process_ids: List[str]) -> Subscription:
+    try:
+        return await components.status_hub.subscribe(process_ids)
+    except SubscriptionRejected as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def parse_ids(ids: Optional[str]) -> List[str]:
+    return list(dict.fromkeys(pid.strip() for pid in (ids or "").split(",") if pid.strip()))
+
+@app.get("/events")
+async def stream_events(ids: str):
+    """Server-sent status events for a comma-separated list of process IDs."""
+    process_ids = parse_ids(ids)
+    if not process_ids:
+        raise HTTPException(status_code=400, detail="No process IDs given")
+    subscription = await open_subscription(process_ids)
+
+    async def stream():
+        try:
+            async for event, data in status_messages(subscription, process_ids):
+                yield f"event: {event}\ndata: {data}\n\n" if event else ": keep-alive\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        # Stop nginx from buffering the stream
+        "X-Accel-Buffering": "no"
+    })
+
+@app.websocket("/ws/events")
+async def websocket_events(websocket: WebSocket, ids: Optional[str] = None):
+    """Status events over a WebSocket.
+
+    Process IDs come from the `ids` query parameter and from
+    {"subscribe": [...]} / {"unsubscribe": [...]} messages. The socket stays
+    open after requests finish, so one connection can follow many.
+    """
+    await websocket.accept()
+    hub = components.status_hub
+    try:
+        subscription = await hub.subscribe(parse_ids(ids))
+    except (SubscriptionRejected, ValueError) as e:
+        await websocket.send_json({"event": "error", "detail": str(e)})
+        # 1013: try again later
+        await websocket.close(code=1013 if isinstance(e, SubscriptionRejected) else 1008)
+        return
+
+    receive = asyncio.ensure_future(websocket.receive_json())
+    try:
+        events = await asyncio.to_thread(recorded_statuses, list(subscription.process_ids))
+        while True:
+            for _, _, raw in events:
+                await websocket.send_text(raw)
+
+            # Wait for either a published event or a client message
+            getter = asyncio.ensure_future(subscription.get())
+            await asyncio.wait((receive, getter), return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                # Cancelling an idle get() loses nothing; the events stay queued
+                getter.cancel()
+                await asyncio.gather(getter, return_exceptions=True)
+                events = []
+            else:
+                events = getter.result()
+                dropped = subscription.take_dropped()
+                if dropped:
+                    await websocket.send_json({"event": "lagged", "dropped": dropped})
+                    events += await asyncio.to_thread(recorded_statuses, list(subscription.process_ids))
+                elif not events:
+                    await websocket.send_json({"event": "keep-alive"})
+                if subscription.closed:
+                    break
+
+            if receive.done():
+                message = receive.result()
+                receive = asyncio.ensure_future(websocket.receive_json())
+                added = [str(pid) for pid in message.get("subscribe", [])] if isinstance(message, dict) else []
+                removed = [str(pid) for pid in message.get("unsubscribe", [])] if isinstance(message, dict) else []
+                try:
+                    hub.update(subscription, add=added, remove=removed)
+                except ValueError as e:
+                    await websocket.send_json({"event": "error", "detail": str(e)})
+                    continue
+                events += await asyncio.to_thread(recorded_statuses, added)
+    except (WebSocketDisconnect, ValueError):
+        # ValueError: a message that is not JSON
+        pass
+    finally:
+        receive.cancel()
+        subscription.close()
+
+@app.get("/routing/rules")
+async def get_routing_rules():
+    """List the routing rules currently in effect."""
+    components.decision_table.reload_if_changed()
+    return {"rules": components.decision_table.rules, "last_error": components.decision_table.last_error}
+
+@app.post("/routing/dry-run")
+async def routing_dry_run(facts: Dict[str, Any]):
+    """Report which routing rule would fire for a set of document facts."""
+    try:
+        decision = components.decision_table.evaluate(facts)
+    except TypeError:
+        raise HTTPException(status_code=400, detail="Facts must be scalar values")
+    return decision.model_dump()
+
+@app.get("/admission")
+async def admission_status():
+    """Report admission queue depths, active slots and rejections."""
+    return components.admission.snapshot()
+
+@app.get("/events/stats")
+async def event_stats():
+    """Report this worker's status subscriptions."""
+    return components.status_hub.snapshot()
+
+@app.get("/flows")
+async def list_flows():
+    """List the compiled flow graphs and their execution levels."""
+    return [flow.describe() for flow in components.flows.flows.values()]
+
+@app.post("/flows/{name}/run")
+async def run_flow(name: str, content: Optional[str] = Form(None), file: Optional[UploadFile] = File(None)):
+    """Run one flow graph in-process on the given input."""
+    if name not in components.flows:
+        raise HTTPException(status_code=404, detail="Flow not found")
+    if file:
+        content = (await file.read()).decode()
+    elif not content:
+        raise HTTPException(status_code=400, detail="No content provided")
+    return {"flow": name, "output": await components.flows.run(name, content)}
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Guard admin endpoints with ADMIN_TOKEN; they are disabled until one is configured."""
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if not secrets.compare_digest(x_admin_token or "", token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def arm_profiler(requests: int = 10, slow_ms: Optional[float] = None, duration_s: float = 300.0):
+    """Profile the next N requests, or up to N requests slower than slow_ms, on every worker."""
+    if requests < 1 or duration_s <= 0:
+        raise HTTPException(status_code=400, detail="requests and duration_s must be positive")
+    return await asyncio.to_thread(components.profiler.arm, requests, slow_ms, duration_s)
+
+@app.delete("/admin/profile", dependencies=[Depends(require_admin)])
+async def disarm_profiler():
+    """Stop capturing profiles."""
+    await asyncio.to_thread(components.profiler.disarm)
+    return {"armed": None}
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def profiler_status():
+    """Report the profiler's arm state and the tracer's export queue."""
+    return {"profiler": components.profiler.status(), "tracing": components.tracer.snapshot()}
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """List captured request profiles, newest first, without their stacks."""
+    captures = await asyncio.to_thread(components.profiler.captures)
+    return [{k: v for k, v in capture.items() if k != "stacks"} for capture in captures]
+
+@app.get("/admin/profiles/{process_id}", dependencies=[Depends(require_admin)])
+async def get_profile(process_id: str):
+    """Collapsed stacks of one captured request, for flamegraph.pl or speedscope."""
+    folded = await asyncio.to_thread(components.profiler.folded, process_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(folded)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: components built and Redis reachable."""
+    loaded = components.loaded()
+    ready = components.preloaded
+    try:
+        redis_ok = await asyncio.to_thread(components.memory_store.ping)
+    except Exception:
+        redis_ok = False
+
+    status = {"ready": ready and redis_ok, "redis": redis_ok, "components": loaded}
+    if components.preload_error:
+        status["error"] = components.preload_error
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -71,4 +71,9 @@ class MemoryEntry(BaseModel):
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
     status: str = "pending"
-    action_taken: Optional[str] = None 
\ No newline at end of file
+    action_taken: Optional[str] = None 
+
+class RoutingDecision(BaseModel):
+    rule: Optional[str] = None
+    action: Optional[str] = None
+    facts: Dict[str, Any] = Field(default_factory=dict)
@@ -0,0 +1,66 @@
+"""Cold-start benchmark for the API process.
+
+Each run starts a fresh interpreter and reports how long it takes to
+import app.main, to build the preloadable components, and to push a first
+document through classification, the format agent and routing. Run with
+--preload to measure a master that builds everything at import time, as
+it does under FLOWBIT_PRELOAD=1.
+
+    python scripts/bench_startup.py --runs 10
+    python scripts/bench_startup.py --runs 10 --preload
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import app.main as main
+t1 = time.perf_counter()
+main.components.preload()
+t2 = time.perf_counter()
+
+async def first_document(content):
+    c = main.components
+    format_type, intent_type, _ = await c.classifier.classify(content)
+    result = await c.email_agent.process(content)
+    return c.decision_table.decide(format_type, intent_type, result)
+
+asyncio.run(first_document(sys.argv[1]))
+t3 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "preload_ms": (t2 - t1) * 1000, "first_document_ms": (t3 - t2) * 1000}))
+"""
+
+
+def run_once(content: str, preload: bool) -> dict:
+    env = dict(os.environ, FLOWBIT_PRELOAD="1" if preload else "0")
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, content],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--preload", action="store_true", help="build components at import time")
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, "samples", "sample_inputs.json")) as f:
+        content = json.load(f)["email_samples"][0]["content"]
+
+    runs = [run_once(content, args.preload) for _ in range(args.runs)]
+    for metric in ("import_ms", "preload_ms", "first_document_ms"):
+        values = [run[metric] for run in runs]
+        print(f"{metric:>18}: median {statistics.median(values):8.1f}  min {min(values):8.1f}  max {max(values):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
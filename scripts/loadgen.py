@@ -0,0 +1,350 @@
+"""Open-loop load generator and traffic replay for the API.
+
+Requests are sent on a fixed arrival schedule (constant or Poisson) no
+matter how long earlier requests take, and each latency is measured from
+the request's scheduled start time, so a stalled server shows up in the
+percentiles instead of silently slowing the generator down (coordinated
+omission).
+
+Traffic is either synthetic, drawn from samples/sample_inputs.json, or
+replayed from a JSON Lines file with one request per line:
+
+    {"endpoint": "/process", "content": "...", "format": "email", "offset": 0.25}
+
+`offset` (seconds from the start) is optional; without it requests are
+spaced by --rate. "/status" lines may omit the process id to reuse one
+returned by an earlier /process call.
+
+    # Against a running server
+    python scripts/loadgen.py run --url http://localhost:8000 --rate 200 --duration 30
+
+    # Fully local: app with fake Redis plus a stub action-endpoint server
+    python scripts/loadgen.py run --local --rate 200 --duration 30
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Deque, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLES_PATH = os.path.join(ROOT, "samples", "sample_inputs.json")
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+    """Log-linear histogram in the style of HdrHistogram.
+
+    Values (microseconds) are bucketed by their top `precision_bits` bits,
+    which bounds the relative error of any reported percentile to
+    2^-precision_bits (under 1% by default) with a small, fixed number of
+    buckets however many samples are recorded.
+    """
+
+    def __init__(self, precision_bits: int = 7):
+        self.precision_bits = precision_bits
+        self.counts: Dict[int, int] = collections.Counter()
+        self.total = 0
+        self.max = 0
+
+    def _bucket(self, value: int) -> int:
+        # Inclusive upper bound, so values that fit in precision_bits are exact
+        shift = max(0, value.bit_length() - self.precision_bits - 1)
+        return (((value >> shift) + 1) << shift) - 1
+
+    def record(self, micros: float) -> None:
+        value = max(1, int(micros))
+        self.counts[self._bucket(value)] += 1
+        self.total += 1
+        self.max = max(self.max, value)
+
+    def percentile(self, pct: float) -> int:
+        """Upper bound of the bucket holding the given percentile."""
+        if not self.total:
+            return 0
+        rank = max(1, int(round(pct / 100.0 * self.total)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(bucket, self.max)
+        return self.max
+
+
+class Stats:
+    """Latency, throughput and error breakdown per traffic label."""
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = collections.defaultdict(LatencyHistogram)
+        self.errors: Dict[str, collections.Counter] = collections.defaultdict(collections.Counter)
+        self.sent = 0
+        self.completed = 0
+        self.dropped = 0
+
+    def record(self, label: str, micros: float, error: Optional[str]) -> None:
+        self.completed += 1
+        self.histograms[label].record(micros)
+        self.histograms["all"].record(micros)
+        if error:
+            self.errors[label][error] += 1
+
+    def drop(self, label: str, reason: str) -> None:
+        """Count a request that was never sent; it has no latency to record."""
+        self.dropped += 1
+        self.errors[label][reason] += 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        labels = {}
+        for label in sorted(set(self.histograms) | set(self.errors)):
+            # Labels with only dropped requests have no histogram
+            histogram = self.histograms.get(label) or LatencyHistogram()
+            labels[label] = {
+                "count": histogram.total,
+                "throughput_rps": histogram.total / elapsed if elapsed else 0.0,
+                "errors": dict(self.errors.get(label, {})),
+                "latency_ms": {
+                    **{f"p{pct:g}": histogram.percentile(pct) / 1000 for pct in PERCENTILES},
+                    "max": histogram.max / 1000
+                }
+            }
+        return {
+            "elapsed_s": elapsed, "sent": self.sent, "completed": self.completed, "dropped": self.dropped, "labels": labels
+        }
+
+
+def load_synthetic(mix: Dict[str, float]) -> Dict[str, Any]:
+    """Build request templates from the sample inputs."""
+    with open(SAMPLES_PATH) as f:
+        samples = json.load(f)
+
+    templates = []
+    for group, items in samples.items():
+        format_name = group.replace("_samples", "")
+        for item in items:
+            content = item["content"]
+            if not isinstance(content, str):
+                content = json.dumps(content)
+            templates.append({"endpoint": "/process", "content": content, "format": format_name})
+
+    weights = {"/process": mix.get("process", 0.0), "/status": mix.get("status", 0.0), "/health": mix.get("health", 0.0)}
+    return {"templates": templates, "weights": weights}
+
+
+def load_recorded(path: str) -> List[Dict[str, Any]]:
+    """Read recorded requests from a JSON Lines file."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def arrival_times(rate: float, duration: float, poisson: bool, seed: int) -> List[float]:
+    """Scheduled offsets (seconds) for an open-loop run."""
+    rng = random.Random(seed)
+    times, t = [], 0.0
+    while True:
+        t += rng.expovariate(rate) if poisson else 1.0 / rate
+        if t >= duration:
+            return times
+        times.append(t)
+
+
+def synthetic_requests(source: Dict[str, Any], count: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    endpoints = list(source["weights"])
+    weights = [source["weights"][e] for e in endpoints]
+    requests = []
+    for _ in range(count):
+        endpoint = rng.choices(endpoints, weights)[0]
+        if endpoint == "/process":
+            requests.append(dict(rng.choice(source["templates"])))
+        else:
+            requests.append({"endpoint": endpoint})
+    return requests
+
+
+async def send(client, request: Dict[str, Any], scheduled: float, stats: Stats, process_ids: Deque[str]) -> None:
+    endpoint = request.get("endpoint", "/process")
+    label = request.get("format") if endpoint == "/process" else endpoint.strip("/").split("/")[0]
+    error = None
+    try:
+        if endpoint == "/process":
+            data = {"content": request["content"]}
+            if request.get("source"):
+                data["source"] = request["source"]
+            response = await client.post("/process", data=data)
+            if response.status_code == 200:
+                process_ids.append(response.json()["process_id"])
+        elif endpoint.startswith("/status"):
+            process_id = request.get("process_id") or (random.choice(process_ids) if process_ids else "unknown")
+            response = await client.get(f"/status/{process_id}")
+        else:
+            response = await client.get(endpoint)
+        if response.status_code >= 400:
+            error = f"http_{response.status_code}"
+    except Exception as e:
+        error = type(e).__name__
+
+    # Measured from the scheduled start, not from when the request went out
+    stats.record(label or "unknown", (time.perf_counter() - scheduled) * 1e6, error)
+
+
+async def run_load(args) -> Dict[str, Any]:
+    import httpx
+
+    if args.traffic:
+        requests = load_recorded(args.traffic)
+        offsets = [r["offset"] for r in requests] if all("offset" in r for r in requests) else \
+            [i / args.rate for i in range(len(requests))]
+    else:
+        mix = {k: float(v) for k, v in (part.split("=") for part in args.mix.split(","))}
+        offsets = arrival_times(args.rate, args.duration, args.poisson, args.seed)
+        requests = synthetic_requests(load_synthetic(mix), len(offsets), args.seed)
+
+    stats = Stats()
+    process_ids: Deque[str] = collections.deque(maxlen=10000)
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    inflight: set = set()
+
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        start = time.perf_counter()
+        for offset, request in zip(offsets, requests):
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            stats.sent += 1
+            if len(inflight) >= args.max_inflight:
+                # Never wait for the server: count the request as failed instead
+                label = request.get("format") or request.get("endpoint", "/").strip("/").split("/")[0]
+                stats.drop(label, "client_saturated")
+                continue
+
+            task = asyncio.create_task(send(client, request, scheduled, stats, process_ids))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+
+        if inflight:
+            await asyncio.wait(inflight)
+        elapsed = time.perf_counter() - start
+
+    return stats.report(elapsed)
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"sent {report['sent']}  completed {report['completed']}  dropped {report['dropped']}  in {report['elapsed_s']:.1f}s")
+    header = f"{'label':<10}{'count':>8}{'rps':>9}" + "".join(f"{'p' + format(p, 'g'):>10}" for p in PERCENTILES) + f"{'max':>10}  errors"
+    print(header)
+    for label, row in report["labels"].items():
+        latency = row["latency_ms"]
+        cells = "".join(f"{latency['p' + format(p, 'g')]:>10.2f}" for p in PERCENTILES)
+        errors = ", ".join(f"{k}={v}" for k, v in row["errors"].items()) or "-"
+        print(f"{label:<10}{row['count']:>8}{row['throughput_rps']:>9.1f}{cells}{latency['max']:>10.2f}  {errors}")
+
+
+def serve(args) -> None:
+    """Run the app against fake Redis with a stub action-endpoint server."""
+    import threading
+    import fakeredis
+    import uvicorn
+    from fastapi import FastAPI
+
+    stub = FastAPI()
+
+    @stub.post("/api/{path:path}")
+    async def accept_action(path: str):
+        return {"status": "accepted", "action": path}
+
+    stub_server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=args.stub_port, log_level="warning"))
+    threading.Thread(target=stub_server.run, daemon=True).start()
+
+    os.environ["ACTION_BASE_URL"] = f"http://127.0.0.1:{args.stub_port}"
+    os.chdir(ROOT)
+    from fakeredis import aioredis
+    from app.core.events import StatusHub
+    from app.main import app, components
+
+    fake = fakeredis.FakeServer()
+    components.memory_store.redis = fakeredis.FakeRedis(server=fake, decode_responses=True)
+    components.stats_engine.redis = fakeredis.FakeRedis(server=fake, decode_responses=True)
+    # Coordination state (profiler, status events) too, before anything builds on a real client
+    components.__dict__["control_redis"] = fakeredis.FakeRedis(server=fake, decode_responses=True)
+    components.__dict__["status_hub"] = StatusHub(
+        components.control_redis, aioredis.FakeRedis(server=fake, decode_responses=True)
+    )
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+
+def wait_ready(url: str, timeout: float = 30.0) -> None:
+    import httpx
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the /process API")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="generate load")
+    run.add_argument("--url", default="http://127.0.0.1:8000")
+    run.add_argument("--rate", type=float, default=50.0, help="target arrivals per second")
+    run.add_argument("--duration", type=float, default=10.0, help="seconds of synthetic traffic")
+    run.add_argument("--poisson", action="store_true", help="exponential inter-arrival times")
+    run.add_argument("--mix", default="process=0.8,status=0.15,health=0.05")
+    run.add_argument("--traffic", help="JSON Lines file of recorded requests to replay")
+    run.add_argument("--connections", type=int, default=256)
+    run.add_argument("--max-inflight", type=int, default=10000)
+    run.add_argument("--timeout", type=float, default=30.0)
+    run.add_argument("--seed", type=int, default=1)
+    run.add_argument("--json", action="store_true", help="print the report as JSON")
+    run.add_argument("--local", action="store_true", help="start the app with fake Redis and a stub action server")
+    run.add_argument("--port", type=int, default=8765)
+    run.add_argument("--stub-port", type=int, default=8766)
+
+    srv = sub.add_parser("serve", help="run the app with fake Redis and a stub action server")
+    srv.add_argument("--port", type=int, default=8765)
+    srv.add_argument("--stub-port", type=int, default=8766)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+        return
+
+    server = None
+    if args.local:
+        args.url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "serve", "--port", str(args.port), "--stub-port", str(args.stub_port)],
+            cwd=ROOT
+        )
+    try:
+        if server:
+            wait_ready(args.url)
+        report = asyncio.run(run_load(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Add or remove a memory store node and move partitions to their new owners.
+
+Run with the same REDIS_URL (and MEMORY_PARTITIONS) as the workers. The ring
+is kept on the first node of REDIS_URL, and every worker picks up a change
+within a second. Partitions are moved only after that, so keep the first
+node in REDIS_URL when changing nodes.
+
+    python scripts/rebalance.py status
+    python scripts/rebalance.py add redis://c:6379
+    python scripts/rebalance.py run --partitions-per-step 4
+
+    python scripts/rebalance.py remove redis://a:6379
+    python scripts/rebalance.py run
+
+An interrupted run can be started again; it continues with the partitions
+that are still migrating.
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Change the nodes of a sharded memory store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="show the shared ring")
+    add = sub.add_parser("add", help="add a node to the ring")
+    add.add_argument("url")
+    remove = sub.add_parser("remove", help="take a node out of the ring")
+    remove.add_argument("url")
+    run = sub.add_parser("run", help="move migrating partitions to their new owners")
+    run.add_argument("--partitions-per-step", type=int, default=4, help="partitions moved between progress reports")
+    run.add_argument("--batch-size", type=int, default=500, help="keys copied per round trip")
+    args = parser.parse_args()
+
+    from app.core.components import Components
+    from app.core.memory import ShardedMemoryStore
+
+    store = Components().memory_store
+    if not isinstance(store, ShardedMemoryStore):
+        raise SystemExit("REDIS_URL must list the nodes of a sharded store (two or more URLs)")
+
+    if args.command == "add":
+        print(f"{store.add_node(args.url)} partitions move to {args.url}; now run `rebalance.py run`")
+    elif args.command == "remove":
+        print(f"{store.remove_node(args.url)} partitions move off {args.url}; now run `rebalance.py run`")
+    elif args.command == "run":
+        remaining = store.rebalance(max_partitions=args.partitions_per_step, batch_size=args.batch_size)
+        while remaining:
+            print(f"{remaining} partitions left", file=sys.stderr)
+            remaining = store.rebalance(max_partitions=args.partitions_per_step, batch_size=args.batch_size)
+        print("rebalanced")
+    print(json.dumps(store.topology(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Re-run classification, agents and routing over stored entries.
+
+Use after changing keyword lists, JSON schemas or routing rules. Progress
+is checkpointed to Redis after every batch; rerun with --resume <job id> to
+continue an interrupted job. Only entries whose outcome changed are written
+back, and the report lists every change.
+
+    # See what would change, without writing anything
+    python scripts/reprocess.py --dry-run --report diff.json
+
+    # Apply, at most 20 entries per second with 4 workers
+    python scripts/reprocess.py --rate 20 --concurrency 4 --report diff.json
+
+    # Continue an interrupted job
+    python scripts/reprocess.py --resume 3f9c2a1b7d4e --report diff.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def print_summary(report) -> None:
+    state = "complete" if report["complete"] else f"stopped at cursor {report['cursor']}"
+    mode = " (dry run)" if report["dry_run"] else ""
+    print(f"job {report['job_id']}{mode}: {state}")
+    print("  " + "  ".join(f"{name}={count}" for name, count in report["counts"].items()))
+    for field, transitions in sorted(report["changes_by_field"].items()):
+        for transition, count in sorted(transitions.items(), key=lambda x: -x[1]):
+            print(f"  {field:<24}{transition:<40}{count:>6}")
+
+
+async def run(args):
+    from app.core.components import Components
+    from app.core.reprocess import ReprocessJob
+
+    components = Components()
+    job = ReprocessJob(
+        components,
+        job_id=args.resume,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        batch_size=args.batch_size,
+        dry_run=args.dry_run
+    )
+    if args.resume:
+        if not job.resume():
+            raise SystemExit(f"No checkpoint for job {args.resume}")
+        if job.dry_run != args.dry_run:
+            mode = "a dry run" if job.dry_run else "not a dry run"
+            raise SystemExit(f"Job {args.resume} is {mode}; resume it with the same --dry-run setting")
+
+    print(f"job {job.job_id} started" + (f" from cursor {job.cursor}" if job.cursor else ""), file=sys.stderr)
+    try:
+        return await job.run(max_entries=args.limit)
+    finally:
+        await components.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk reprocessing of stored entries")
+    parser.add_argument("--resume", metavar="JOB_ID", help="continue a job from its last checkpoint")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=20.0, help="max entries per second (0 = unlimited)")
+    parser.add_argument("--batch-size", type=int, default=100, help="entries per checkpoint")
+    parser.add_argument("--limit", type=int, help="stop after this many entries")
+    parser.add_argument("--dry-run", action="store_true", help="report changes without writing them")
+    parser.add_argument("--report", help="write the full diff report to this JSON file")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    report = asyncio.run(run(args))
+    print_summary(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
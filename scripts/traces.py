@@ -0,0 +1,70 @@
+"""Show traces written by the file exporter (TRACE_EXPORT=file:<path>).
+
+    # Span tree of one request
+    python scripts/traces.py traces.jsonl --process-id 0b6f...
+
+    # The ten slowest requests, with their span trees
+    python scripts/traces.py traces.jsonl --slowest 10
+"""
+import argparse
+import collections
+import json
+import uuid
+from typing import Any, Dict, List
+
+
+def load_spans(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Group the spans in an OTLP/JSON lines file by trace ID."""
+    traces: Dict[str, List[Dict[str, Any]]] = collections.defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource in json.loads(line).get("resourceSpans", []):
+                for scope in resource.get("scopeSpans", []):
+                    for span in scope.get("spans", []):
+                        traces[span["traceId"]].append(span)
+    return traces
+
+
+def duration_ms(span: Dict[str, Any]) -> float:
+    return (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+
+
+def print_tree(spans: List[Dict[str, Any]]) -> None:
+    children = collections.defaultdict(list)
+    for span in spans:
+        children[span.get("parentSpanId")].append(span)
+
+    def walk(parent_id, depth):
+        for span in sorted(children.get(parent_id, []), key=lambda s: int(s["startTimeUnixNano"])):
+            status = " ERROR " + span["status"].get("message", "") if span["status"].get("code") == 2 else ""
+            print(f"{'  ' * depth}{span['name']:<{40 - 2 * depth}}{duration_ms(span):>10.2f} ms{status}")
+            walk(span["spanId"], depth + 1)
+
+    walk(None, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect exported request traces")
+    parser.add_argument("path")
+    parser.add_argument("--process-id")
+    parser.add_argument("--slowest", type=int, default=5)
+    args = parser.parse_args()
+
+    traces = load_spans(args.path)
+    if args.process_id:
+        trace_ids = [uuid.UUID(args.process_id).hex]
+    else:
+        roots = [s for spans in traces.values() for s in spans if not s.get("parentSpanId")]
+        roots.sort(key=duration_ms, reverse=True)
+        trace_ids = [root["traceId"] for root in roots[:args.slowest]]
+
+    for trace_id in trace_ids:
+        print(f"trace {trace_id}")
+        print_tree(traces.get(trace_id, []))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import asyncio
+import pytest
+from app.core.admission import AdmissionController, AdmissionRejected, Priority, sniff_priority
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_sniff_priority():
+    assert sniff_priority("Subject: Production outage\n\nEverything is down", "ops", {"ops": Priority.HIGH}) == Priority.CRITICAL
+    assert sniff_priority("Subject: Please reply asap") == Priority.HIGH
+    # Unlisted or absent sources cannot reach the critical slots through wording
+    assert sniff_priority("Subject: Production outage") == Priority.HIGH
+    assert sniff_priority("Subject: Production outage", "made-up") == Priority.HIGH
+    assert sniff_priority("Subject: Lunch on Friday?") == Priority.NORMAL
+    # Keywords inside webhook payloads are data, not urgency hints
+    assert sniff_priority('{"note": "urgent"}') == Priority.BULK
+    assert sniff_priority('{"note": "urgent"}', "partner", {"partner": Priority.HIGH}) == Priority.HIGH
+    # Wording raises a configured source by one level at most
+    assert sniff_priority("Nothing critical here", "batch", {"batch": Priority.BULK}) == Priority.NORMAL
+    assert sniff_priority("Please reply asap", "batch", {"batch": Priority.BULK}) == Priority.NORMAL
+    assert sniff_priority("Outage!", "partner", {"partner": Priority.HIGH}) == Priority.CRITICAL
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_by_priority():
+    controller = AdmissionController(max_concurrency=1, reserved_critical=0)
+    order = []
+    gate = asyncio.Event()
+
+    async def request(priority, name):
+        async with controller.admit(priority):
+            order.append(name)
+            await gate.wait()
+
+    holder = asyncio.create_task(request(Priority.NORMAL, "holder"))
+    await asyncio.sleep(0)
+    waiters = [
+        asyncio.create_task(request(Priority.BULK, "bulk")),
+        asyncio.create_task(request(Priority.NORMAL, "normal")),
+        asyncio.create_task(request(Priority.CRITICAL, "critical"))
+    ]
+    await asyncio.sleep(0)
+    assert controller.snapshot()["queued"] == {"critical": 1, "high": 0, "normal": 1, "bulk": 1}
+
+    gate.set()
+    await asyncio.gather(holder, *waiters)
+    assert order == ["holder", "critical", "normal", "bulk"]
+    assert controller.active == 0
+
+@pytest.mark.asyncio
+async def test_reserved_slots_only_go_to_critical():
+    controller = AdmissionController(max_concurrency=2, reserved_critical=1, max_wait={p: 0.01 for p in Priority})
+
+    async with controller.admit(Priority.NORMAL):
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit(Priority.HIGH):
+                pass
+        assert rejected.value.reason == "queue_timeout"
+
+        async with controller.admit(Priority.CRITICAL):
+            assert controller.active == 2
+
+@pytest.mark.asyncio
+async def test_full_queue_sheds_lower_priority():
+    controller = AdmissionController(max_concurrency=1, reserved_critical=0, max_queued=1)
+    gate = asyncio.Event()
+
+    async def request(priority):
+        async with controller.admit(priority):
+            await gate.wait()
+
+    holder = asyncio.create_task(request(Priority.NORMAL))
+    await asyncio.sleep(0)
+    bulk = asyncio.create_task(request(Priority.BULK))
+    await asyncio.sleep(0)
+
+    # A second bulk request is refused outright; a critical one displaces the first
+    with pytest.raises(AdmissionRejected) as rejected:
+        await request(Priority.BULK)
+    assert rejected.value.reason == "queue_full"
+    assert rejected.value.retry_after >= 1
+
+    critical = asyncio.create_task(request(Priority.CRITICAL))
+    await asyncio.sleep(0)
+    gate.set()
+    with pytest.raises(AdmissionRejected) as shed:
+        await bulk
+    assert shed.value.reason == "shed"
+    await asyncio.gather(holder, critical)
+    assert controller.snapshot()["rejected"] == {"queue_full": 1, "shed": 1}
+
+@pytest.mark.asyncio
+async def test_per_client_rate_limit():
+    clock = FakeClock()
+    controller = AdmissionController(
+        client_rate=1.0, client_burst=2.0, trusted_clients=["10.0.0.9"], clock=clock
+    )
+
+    for _ in range(2):
+        async with controller.admit(Priority.NORMAL, "10.0.0.1"):
+            pass
+    with pytest.raises(AdmissionRejected) as rejected:
+        async with controller.admit(Priority.NORMAL, "10.0.0.1"):
+            pass
+    assert (rejected.value.reason, rejected.value.retry_after) == ("rate_limited", 1)
+
+    # Other clients are unaffected, and critical priority does not bypass the limit
+    async with controller.admit(Priority.NORMAL, "10.0.0.2"):
+        pass
+    with pytest.raises(AdmissionRejected):
+        async with controller.admit(Priority.CRITICAL, "10.0.0.1"):
+            pass
+
+    # Only trusted clients skip the bucket
+    for _ in range(5):
+        async with controller.admit(Priority.NORMAL, "10.0.0.9"):
+            pass
+
+    clock.now = 1.0
+    async with controller.admit(Priority.NORMAL, "10.0.0.1"):
+        pass
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_frees_its_place():
+    controller = AdmissionController(max_concurrency=1, reserved_critical=0)
+    gate = asyncio.Event()
+
+    async def request(priority):
+        async with controller.admit(priority):
+            await gate.wait()
+
+    holder = asyncio.create_task(request(Priority.NORMAL))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(request(Priority.NORMAL))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    assert controller.snapshot()["queued"]["normal"] == 0
+
+    gate.set()
+    await holder
+    assert controller.active == 0
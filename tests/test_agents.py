@@ -3,6 +3,7 @@ from app.agents.classifier import ClassifierAgent
 from app.agents.email_agent import EmailAgent
 from app.agents.json_agent import JsonAgent
 from app.agents.pdf_agent import PdfAgent
+from app.core.matching import KeywordMatcher
 from app.models.schemas import InputFormat, BusinessIntent, Tone, Urgency
 
 # Test data
@@ -36,6 +37,50 @@ SAMPLE_JSON = """
 }
 """
 
+SAMPLE_MULTIPART_EMAIL = """From: vendor@example.com
+To: accounts@example.com
+Subject: Invoice attached
+MIME-Version: 1.0
+Content-Type: multipart/mixed; boundary="XYZ"
+
+--XYZ
+Content-Type: text/plain; charset="utf-8"
+
+Dear Accounts, please find our invoice attached. No rush.
+--XYZ
+Content-Type: application/json
+Content-Disposition: attachment; filename="invoice.json"
+Content-Transfer-Encoding: base64
+
+eyJpbnZvaWNlX251bWJlciI6ICJJTlYtMSIsICJhbW91bnQiOiAyMCwgImN1cnJlbmN5IjogIlVT
+RCIsICJpdGVtcyI6IFtdfQ==
+--XYZ
+Content-Type: application/octet-stream
+Content-Disposition: attachment; filename="urgent.bin"
+Content-Transfer-Encoding: base64
+
+dXJnZW50IGltbWVkaWF0ZWx5IGNyaXRpY2Fs
+--XYZ--
+"""
+
+SAMPLE_FORWARDED_EMAIL = """From: accounts@example.com
+To: ap@example.com
+Subject: Fwd: Invoice attached
+MIME-Version: 1.0
+Content-Type: multipart/mixed; boundary="OUTER"
+
+--OUTER
+Content-Type: text/plain; charset="utf-8"
+
+See the message below.
+--OUTER
+Content-Type: message/rfc822
+Content-Disposition: attachment; filename="forwarded.eml"
+
+""" + SAMPLE_MULTIPART_EMAIL + """
+--OUTER--
+"""
+
 SAMPLE_PDF_CONTENT = """
 INVOICE
 Invoice Number: INV-2024-002
@@ -84,6 +129,43 @@ async def test_email_agent(email_agent):
     assert response.data["urgency"] == Urgency.HIGH
     assert response.next_action == "escalate_issue"
 
+@pytest.mark.asyncio
+async def test_email_agent_multipart_attachments():
+    response = await EmailAgent().process(SAMPLE_MULTIPART_EMAIL)
+    assert response.success
+    assert response.data["fields"]["subject"] == "Invoice attached"
+    assert "base64" not in response.data["fields"]["body"]
+    # Binary attachments are not scanned for tone or urgency
+    assert response.data["urgency"] == Urgency.LOW
+
+    attachments = {a["filename"]: a for a in response.data["attachments"]}
+    assert attachments["invoice.json"]["result"]["data"]["schema_version"] == "invoice"
+    assert attachments["urgent.bin"]["skipped"] == "unsupported_type"
+
+@pytest.mark.asyncio
+async def test_email_agent_skips_oversized_attachments():
+    response = await EmailAgent(max_attachment_bytes=10).process(SAMPLE_MULTIPART_EMAIL)
+    attachments = {a["filename"]: a for a in response.data["attachments"]}
+    assert attachments["invoice.json"]["skipped"] == "too_large"
+    assert "result" not in attachments["invoice.json"]
+
+@pytest.mark.asyncio
+async def test_email_agent_reads_attachments_of_forwarded_messages():
+    response = await EmailAgent().process(SAMPLE_FORWARDED_EMAIL)
+    attachments = {a["filename"]: a for a in response.data["attachments"]}
+    assert set(attachments) == {"invoice.json", "urgent.bin"}
+    assert attachments["invoice.json"]["result"]["data"]["schema_version"] == "invoice"
+
+def test_keyword_matcher_matches_substring_scoring():
+    agent = EmailAgent()
+    text = SAMPLE_EMAIL.lower()
+    for keywords, matcher in ((agent.tone_keywords, agent.tone_matcher), (agent.urgency_keywords, agent.urgency_matcher)):
+        expected = {category: sum(1 for kw in kws if kw in text) for category, kws in keywords.items()}
+        assert {c: s for c, s in matcher.scores(text).items() if c in expected} == expected
+
+    # Ties resolve to the first category, as with per-category scoring
+    assert KeywordMatcher({"a": ["x"], "b": ["x"]}).best("x") == "a"
+
 def test_json_agent(json_agent):
     # Test JSON processing
     response = json_agent.process(SAMPLE_JSON)
@@ -0,0 +1,54 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from app import main
+from app.core.components import Components
+from app.core.memory import MemoryStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_importing_the_app_builds_nothing():
+    # A fresh interpreter, since other tests may already have built components
+    env = {key: value for key, value in os.environ.items() if key != "FLOWBIT_PRELOAD"}
+    code = "import json, app.main; print(json.dumps(app.main.components.loaded()))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    loaded = json.loads(output.stdout.strip().splitlines()[-1])
+    assert set(loaded) == set(Components.PRELOADABLE + Components.CLIENTS)
+    assert not any(loaded.values())
+
+def test_preload_builds_only_shareable_components():
+    components = Components()
+    components.preload()
+    assert components.preloaded
+    loaded = components.loaded()
+    assert {name for name, built in loaded.items() if built} == set(Components.PRELOADABLE)
+
+@pytest.mark.asyncio
+async def test_ready_reports_a_failed_warm_up(monkeypatch):
+    components = Components()
+    store = MemoryStore()
+    store.redis = fakeredis.FakeRedis(decode_responses=True)
+    components.memory_store = store
+
+    def broken_preload():
+        raise RuntimeError("rules file unreadable")
+
+    monkeypatch.setattr(components, "preload", broken_preload)
+    monkeypatch.setattr(main, "components", components)
+
+    await main.warm_up()
+    for _ in range(100):
+        if components.preload_error:
+            break
+        await asyncio.sleep(0.01)
+
+    response = TestClient(main.app).get("/ready")
+    assert response.status_code == 503
+    body = response.json()
+    assert body["redis"] is True and body["ready"] is False
+    assert body["error"] == "RuntimeError: rules file unreadable"
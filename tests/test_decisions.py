@@ -0,0 +1,59 @@
+import json
+import os
+import pytest
+from app.core.decisions import CompiledTable, DecisionTable, document_facts
+from app.models.schemas import InputFormat, BusinessIntent, AgentResponse
+
+BASE_FACTS = {
+    "format": "json", "intent": "invoice", "tone": None, "urgency": None, "valid": True,
+    "anomalies": False, "compliance": False, "fraud": False, "duplicate": False
+}
+
+@pytest.fixture
+def decision_table():
+    return DecisionTable(known_actions=["create_ticket", "escalate_issue", "flag_compliance", "log_alert"])
+
+def test_first_matching_rule_fires(decision_table):
+    assert decision_table.evaluate(BASE_FACTS).rule == "default"
+    assert decision_table.evaluate({**BASE_FACTS, "anomalies": True}).action == "flag_compliance"
+    # Rule order decides between overlapping rules
+    decision = decision_table.evaluate({**BASE_FACTS, "anomalies": True, "fraud": True})
+    assert (decision.rule, decision.action) == ("fraud_risk", "escalate_issue")
+
+def test_missing_facts_only_match_rules_that_ignore_them(decision_table):
+    assert decision_table.evaluate({"format": "email", "urgency": "critical"}).rule == "urgent_email"
+    assert decision_table.evaluate({"urgency": "critical"}).rule == "default"
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        CompiledTable([{"name": "bad", "when": {"urgency": "extreme"}, "action": "log_alert"}])
+    with pytest.raises(ValueError):
+        CompiledTable([{"name": "bad", "when": {}, "action": "send_fax"}], known_actions=["log_alert"])
+
+def test_rules_hot_reload(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"rules": [{"name": "all", "when": {}, "action": "log_alert"}]}))
+    table = DecisionTable(str(path), reload_interval=0)
+    assert table.evaluate(BASE_FACTS).action == "log_alert"
+
+    path.write_text(json.dumps({"rules": [{"name": "all", "when": {}, "action": "create_ticket"}]}))
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    assert table.evaluate(BASE_FACTS).action == "create_ticket"
+
+    # A broken file keeps the previous table in place
+    path.write_text("{")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2_000_000))
+    assert table.evaluate(BASE_FACTS).action == "create_ticket"
+    assert table.last_error
+
+def test_document_facts_from_email_result():
+    result = AgentResponse(
+        success=True,
+        message="Email processed successfully",
+        data={"tone": "escalation", "urgency": "high", "attachments": [
+            {"agent": "pdf", "result": {"data": {"compliance_flags": ["gdpr"]}}}
+        ]}
+    )
+    facts = document_facts(InputFormat.EMAIL, BusinessIntent.COMPLAINT, result)
+    assert facts["urgency"] == "high"
+    assert facts["compliance"] is True
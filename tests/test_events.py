@@ -0,0 +1,102 @@
+import asyncio
+import json
+import fakeredis
+import pytest
+from fakeredis import aioredis
+from app.core.events import StatusHub, SubscriptionRejected
+
+def make_hub(**options):
+    server = fakeredis.FakeServer()
+    publisher = fakeredis.FakeRedis(server=server, decode_responses=True)
+    listener = aioredis.FakeRedis(server=server, decode_responses=True)
+    return StatusHub(publisher, listener, **options)
+
+async def next_events(subscription):
+    return [json.loads(raw) for _, _, raw in await asyncio.wait_for(subscription.get(), 2)]
+
+@pytest.mark.asyncio
+async def test_events_reach_every_subscriber_of_a_process():
+    hub = make_hub()
+    first = await hub.subscribe(["p1"])
+    both = await hub.subscribe(["p1", "p2"])
+    other = await hub.subscribe(["p3"])
+    try:
+        hub.publish("p1", "processing")
+        hub.publish("p2", "completed", action={"success": True})
+        assert [e["status"] for e in await next_events(first)] == ["processing"]
+        events = await next_events(both)
+        while len(events) < 2:
+            events += await next_events(both)
+        assert [(e["process_id"], e["status"]) for e in events] == [("p1", "processing"), ("p2", "completed")]
+        assert other.queue is None
+
+        first.close()
+        assert set(hub.by_id) == {"p1", "p2", "p3"}
+        both.close()
+        assert set(hub.by_id) == {"p3"}
+    finally:
+        await hub.close()
+
+@pytest.mark.asyncio
+async def test_slow_subscribers_drop_old_events():
+    hub = make_hub(queue_size=2)
+    subscription = await hub.subscribe(["p1"])
+    try:
+        for status in ("accepted", "processing", "routed", "completed"):
+            hub.dispatch(json.dumps({"process_id": "p1", "status": status}))
+        events = await next_events(subscription)
+        assert [e["status"] for e in events] == ["routed", "completed"]
+        assert subscription.take_dropped() == 2
+        # The buffer is released once drained
+        assert subscription.queue is None
+    finally:
+        await hub.close()
+
+@pytest.mark.asyncio
+async def test_subscription_limits():
+    hub = make_hub(max_subscriptions=1, max_ids=2)
+    try:
+        with pytest.raises(ValueError):
+            await hub.subscribe(["a", "b", "c"])
+        subscription = await hub.subscribe(["a"])
+        with pytest.raises(SubscriptionRejected):
+            await hub.subscribe(["b"])
+
+        hub.update(subscription, add=["b"], remove=["a"])
+        assert subscription.process_ids == ("b",) and set(hub.by_id) == {"b"}
+        with pytest.raises(ValueError):
+            hub.update(subscription, add=["c", "d"])
+    finally:
+        await hub.close()
+
+@pytest.mark.asyncio
+async def test_heartbeat_wakes_idle_subscribers():
+    hub = make_hub(heartbeat=0.01)
+    subscription = await hub.subscribe(["p1"])
+    try:
+        assert await asyncio.wait_for(subscription.get(), 1) == []
+    finally:
+        await hub.close()
+
+@pytest.mark.asyncio
+async def test_last_status_is_recorded_for_late_subscribers():
+    hub = make_hub()
+    hub.publish("p1", "processing")
+    hub.publish("p1", "failed", error="boom")
+    [(process_id, terminal, raw)] = hub.recorded(["p1", "p2"])
+    assert (process_id, terminal) == ("p1", True)
+    assert json.loads(raw)["error"] == "boom" and json.loads(raw)["snapshot"] is True
+
+@pytest.mark.asyncio
+async def test_subscribe_fails_when_the_channel_is_unavailable():
+    class DownRedis:
+        def pubsub(self):
+            raise ConnectionError("refused")
+
+    hub = StatusHub(fakeredis.FakeRedis(decode_responses=True), DownRedis(), connect_timeout=0.05)
+    try:
+        with pytest.raises(SubscriptionRejected):
+            await hub.subscribe(["p1"])
+    finally:
+        for task in hub._tasks:
+            task.cancel()
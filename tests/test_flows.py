@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from app.core.components import Components
+from app.core.flows import CompiledFlow, FlowLibrary
+from app.models.schemas import AgentResponse
+
+SAMPLE_EMAIL = """From: buyer@example.com
+Subject: Urgent: invoice dispute
+
+Please fix this immediately.
+"""
+
+class SlowAgent:
+    def __init__(self):
+        self.calls = 0
+
+    async def process(self, content):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return AgentResponse(success=True, message="ok", data={"length": len(content)})
+
+class BarrierAgent:
+    """Returns only once every agent sharing `arrived` has been called."""
+
+    def __init__(self, arrived, parties):
+        self.arrived = arrived
+        self.parties = parties
+
+    async def process(self, content):
+        self.arrived.append(content)
+        while len(self.arrived) < self.parties:
+            await asyncio.sleep(0)
+        return AgentResponse(success=True, message="ok", data={"length": len(content)})
+
+class StubComponents:
+    def __init__(self):
+        self.email_agent = SlowAgent()
+        self.pdf_agent = SlowAgent()
+
+def branching_spec(edges=None):
+    return {
+        "nodes": [
+            {"id": "input", "type": "InputNode"},
+            {"id": "email", "type": "EmailProcessorNode"},
+            {"id": "pdf", "type": "PDFProcessorNode"},
+            {"id": "output", "type": "OutputNode"}
+        ],
+        "edges": edges or [
+            {"source": "input", "target": "email"},
+            {"source": "input", "target": "pdf"},
+            {"source": "email", "target": "output"},
+            {"source": "pdf", "target": "output"}
+        ]
+    }
+
+@pytest.fixture(scope="module")
+def components():
+    return Components()
+
+def test_agent_flows_compile(components):
+    library = FlowLibrary(components)
+    assert set(library.flows) == {"classifier_agent", "email_agent", "json_agent", "pdf_agent"}
+    levels = library.get("email_agent").describe()["levels"]
+    assert [[node["id"] for node in level] for level in levels] == [["input"], ["email_processor"], ["output"]]
+
+@pytest.mark.asyncio
+async def test_flows_match_the_agents(components):
+    library = FlowLibrary(components)
+    direct = await components.email_agent.process(SAMPLE_EMAIL)
+    assert await library.run("email_agent", SAMPLE_EMAIL) == direct.model_dump(mode="json")
+
+    format_type, intent_type, confidence = await components.classifier.classify(SAMPLE_EMAIL)
+    classified = await library.run("classifier_agent", SAMPLE_EMAIL)
+    assert classified == {"format": format_type.value, "intent": intent_type.value, "confidence": confidence}
+
+@pytest.mark.asyncio
+async def test_independent_branches_run_concurrently():
+    stub = StubComponents()
+    arrived = []
+    stub.email_agent = stub.pdf_agent = BarrierAgent(arrived, parties=2)
+    flow = CompiledFlow("branching", branching_spec(), stub)
+    # Run one after the other, neither branch could return
+    output = await asyncio.wait_for(flow.run("abc"), 5)
+    assert output["email"].data == output["pdf"].data == {"length": 3}
+
+@pytest.mark.asyncio
+async def test_request_cache_shares_node_outputs():
+    stub = StubComponents()
+    flow = CompiledFlow("branching", branching_spec(), stub)
+    cache = {}
+    first, second = await asyncio.gather(flow.run("abc", cache), flow.run("abc", cache))
+    assert first == second
+    assert (stub.email_agent.calls, stub.pdf_agent.calls) == (1, 1)
+
+    # Different input, different outputs
+    await flow.run("abcd", cache)
+    assert stub.email_agent.calls == 2
+
+def test_invalid_graphs_are_rejected_at_load():
+    with pytest.raises(ValueError, match="cycle"):
+        CompiledFlow("cyclic", branching_spec([
+            {"source": "input", "target": "email"},
+            {"source": "email", "target": "pdf"},
+            {"source": "pdf", "target": "email"},
+            {"source": "pdf", "target": "output"}
+        ]), StubComponents())
+    with pytest.raises(ValueError, match="unsupported node type"):
+        CompiledFlow("unknown", {"nodes": [{"id": "t", "type": "TextPreprocessor"}], "edges": []}, StubComponents())
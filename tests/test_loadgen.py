@@ -0,0 +1,48 @@
+import random
+import pytest
+from scripts.loadgen import LatencyHistogram, Stats, arrival_times
+
+def test_histogram_percentiles_are_bucket_upper_bounds():
+    histogram = LatencyHistogram(precision_bits=7)
+    values = sorted(random.Random(1).randint(1, 10_000_000) for _ in range(10000))
+    for value in values:
+        histogram.record(value)
+
+    for pct in (1.0, 50.0, 90.0, 99.0, 99.9, 100.0):
+        exact = values[max(1, round(pct / 100 * len(values))) - 1]
+        reported = histogram.percentile(pct)
+        # Never below the true value, and at most 2^-7 above it
+        assert exact <= reported <= exact * (1 + 2 ** -7)
+    assert histogram.percentile(100.0) == max(values)
+
+def test_histogram_small_values_are_exact():
+    histogram = LatencyHistogram(precision_bits=7)
+    for value in (1, 2, 3, 200):
+        histogram.record(value)
+    assert [histogram.percentile(p) for p in (25, 50, 75)] == [1, 2, 3]
+    assert histogram.percentile(50) == 2 and LatencyHistogram().percentile(50) == 0
+
+def test_arrival_times_constant_and_poisson():
+    constant = arrival_times(10, 1.0, poisson=False, seed=0)
+    assert constant[:3] == pytest.approx([0.1, 0.2, 0.3])
+    assert 9 <= len(constant) <= 10 and constant[-1] < 1.0
+
+    poisson = arrival_times(1000, 10.0, poisson=True, seed=7)
+    assert poisson == arrival_times(1000, 10.0, poisson=True, seed=7)
+    assert all(a < b for a, b in zip(poisson, poisson[1:])) and poisson[-1] < 10.0
+    assert len(poisson) == pytest.approx(10000, rel=0.05)
+
+def test_dropped_requests_stay_out_of_the_histograms():
+    stats = Stats()
+    stats.record("/process", 2000, None)
+    stats.drop("/process", "client_saturated")
+    stats.drop("/status", "client_saturated")
+
+    report = stats.report(elapsed=1.0)
+    assert (report["completed"], report["dropped"]) == (1, 2)
+    assert report["labels"]["/process"]["count"] == 1
+    assert report["labels"]["/process"]["errors"] == {"client_saturated": 1}
+    assert report["labels"]["/status"]["count"] == 0
+    assert report["labels"]["/status"]["latency_ms"]["p99"] == 0
+    assert report["labels"]["all"]["count"] == 1
+    assert set(stats.histograms) == {"/process", "all"}
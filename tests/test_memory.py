@@ -0,0 +1,146 @@
+import fakeredis
+import pytest
+from app.core.memory import MemoryStore
+from app.core.identifiers import correlate
+from app.models.schemas import InputFormat, BusinessIntent, BaseInput, MemoryEntry, AgentResponse
+
+INVOICE_IDENTIFIERS = {
+    "source": "webhook",
+    "sender": "acme",
+    "invoice_number": "INV-2024-001",
+    "request_id": None,
+    "amount": 15000.0,
+    "currency": "USD"
+}
+
+def make_entry(entry_id, identifiers, format_type=InputFormat.JSON):
+    return MemoryEntry(
+        id=entry_id,
+        input_data=BaseInput(
+            source=identifiers["source"],
+            format=format_type,
+            intent=BusinessIntent.INVOICE,
+            metadata={"identifiers": identifiers}
+        ),
+        agent_responses=[AgentResponse(success=True, message="ok", next_action="create_ticket")]
+    )
+
+@pytest.fixture
+def memory_store():
+    store = MemoryStore()
+    store.redis = fakeredis.FakeRedis(decode_responses=True)
+    return store
+
+def test_store_and_get_entry_round_trip(memory_store):
+    memory_store.store_entry(make_entry("e1", INVOICE_IDENTIFIERS))
+    entry = memory_store.get_entry("e1")
+    assert entry.input_data.metadata["identifiers"]["invoice_number"] == "INV-2024-001"
+    assert entry.agent_responses[0].next_action == "create_ticket"
+
+def test_find_related_by_identifier(memory_store):
+    memory_store.store_entry(make_entry("e1", INVOICE_IDENTIFIERS))
+    memory_store.store_entry(make_entry("e2", {**INVOICE_IDENTIFIERS, "invoice_number": "inv-2024-001 "}))
+
+    related = memory_store.find_related(INVOICE_IDENTIFIERS, exclude_id="e2")
+    assert related["invoice_number"] == ["e1"]
+    assert related["amount"] == ["e1"]
+
+    memory_store.delete_entry("e1")
+    assert memory_store.find_related(INVOICE_IDENTIFIERS, exclude_id="e2") == {}
+
+def test_correlate_duplicates_and_follow_ups():
+    related = {"invoice_number": ["e1"]}
+    assert correlate(InputFormat.PDF, INVOICE_IDENTIFIERS, related)["duplicate_of"] == ["e1"]
+    assert correlate(InputFormat.EMAIL, INVOICE_IDENTIFIERS, related)["follow_up_of"] == ["e1"]
+
+    # Same amount from the same sender but a different invoice number is not a duplicate
+    assert correlate(InputFormat.JSON, INVOICE_IDENTIFIERS, {"amount": ["e1"]})["duplicate_of"] == []
+
+def test_invoice_after_an_email_mentioning_it_is_not_a_duplicate(memory_store):
+    mention = {**INVOICE_IDENTIFIERS, "format": "email"}
+    memory_store.store_entry(make_entry("mail", mention, InputFormat.EMAIL))
+    document = {**INVOICE_IDENTIFIERS, "format": "json"}
+    memory_store.store_entry(make_entry("doc", document))
+
+    related = memory_store.find_related(document, exclude_id="doc")
+    assert "invoice_number" not in related and related["mention:invoice_number"] == ["mail"]
+    assert correlate(InputFormat.JSON, document, related)["duplicate_of"] == []
+
+    # A second copy of the document is still a duplicate, and a later email follows up on both
+    related = memory_store.find_related(document, limit=1)
+    assert related["invoice_number"] == ["doc"] and related["mention:invoice_number"] == ["mail"]
+    assert correlate(InputFormat.JSON, document, related)["duplicate_of"] == ["doc"]
+    assert correlate(InputFormat.EMAIL, mention, related)["follow_up_of"] == ["doc", "mail"]
+
+def fake_node():
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+@pytest.fixture
+def sharded_store():
+    from app.core.memory import ShardedMemoryStore
+    return ShardedMemoryStore({f"node{i}": fake_node() for i in range(3)}, partitions=16, poll_interval=0)
+
+def store_invoices(store, count):
+    for i in range(count):
+        identifiers = {**INVOICE_IDENTIFIERS, "invoice_number": f"INV-{i % 5}"}
+        store.store_entry(make_entry(f"e{i}", identifiers))
+
+def test_sharded_store_keeps_entry_and_indexes_on_one_node(sharded_store):
+    store_invoices(sharded_store, 40)
+
+    for name, node in sharded_store.nodes.items():
+        for key in node.keys("flowbit:{p*"):
+            partition = int(key.split("{p")[1].split("}")[0])
+            assert sharded_store._owner(sharded_store.ring, partition) == name
+    assert sum(1 for node in sharded_store.nodes.values() if node.dbsize()) > 1
+
+def test_sharded_store_merges_listing_and_search(sharded_store):
+    store_invoices(sharded_store, 40)
+
+    assert len(sharded_store.list_entries(limit=100)) == 40
+    related = sharded_store.find_related({**INVOICE_IDENTIFIERS, "invoice_number": "INV-3"})
+    assert sorted(related["invoice_number"]) == sorted(f"e{i}" for i in range(40) if i % 5 == 3)
+
+def test_sharded_store_rebalances_online(sharded_store):
+    store_invoices(sharded_store, 40)
+
+    moved = sharded_store.add_node("node3", fake_node())
+    assert moved > 0
+    # Entries stay readable while their partitions are being moved
+    assert all(sharded_store.get_entry(f"e{i}") for i in range(40))
+    sharded_store.store_entry(make_entry("late", INVOICE_IDENTIFIERS))
+
+    while sharded_store.rebalance(max_partitions=2):
+        assert len(sharded_store.list_entries(limit=100)) == 41
+
+    assert sharded_store.nodes["node3"].dbsize() > 0
+    related = sharded_store.find_related({**INVOICE_IDENTIFIERS, "invoice_number": "INV-3"})
+    assert len(related["invoice_number"]) == 8
+
+    sharded_store.remove_node("node0")
+    sharded_store.rebalance()
+    assert "node0" not in sharded_store.nodes
+    assert all(sharded_store.get_entry(f"e{i}") for i in range(40))
+
+def test_rebalance_is_shared_by_every_store():
+    from app.core.memory import ShardedMemoryStore
+    clients = {f"node{i}": fake_node() for i in range(4)}
+    initial = {name: clients[name] for name in ("node0", "node1", "node2")}
+
+    def make_store(nodes):
+        return ShardedMemoryStore(dict(nodes), partitions=16, poll_interval=0, connect=clients.__getitem__)
+
+    admin, worker = make_store(initial), make_store(initial)
+    store_invoices(worker, 40)
+
+    assert admin.add_node("node3", clients["node3"]) > 0
+    # The worker follows the new ring: it writes to new owners and reads both
+    worker.store_entry(make_entry("late", INVOICE_IDENTIFIERS))
+    assert worker._owner(worker.ring, worker._partition("late")) == admin._owner(admin.ring, admin._partition("late"))
+    while admin.rebalance(max_partitions=3):
+        assert len(worker.list_entries(limit=100)) == 41
+
+    assert all(worker.get_entry(f"e{i}") for i in range(40)) and worker.get_entry("late")
+    # A worker started afterwards with an outdated node list uses the shared ring
+    restarted = make_store(initial)
+    assert "node3" in restarted.ring.nodes and len(restarted.list_entries(limit=100)) == 41
@@ -0,0 +1,140 @@
+import json
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+import fakeredis
+import pytest
+from app.core.components import Components
+from app.core.memory import MemoryStore
+from app.core.reprocess import ReprocessJob
+from app.models.schemas import InputFormat, BusinessIntent, BaseInput, MemoryEntry, AgentResponse
+
+INVOICE = json.dumps({
+    "invoice_number": "INV-7", "amount": 120.0, "currency": "USD",
+    "items": [{"description": "Widget", "quantity": 1, "price": 120.0}]
+})
+
+def make_entry(entry_id, intent=BusinessIntent.INVOICE, timestamp=None):
+    entry = MemoryEntry(
+        id=entry_id,
+        input_data=BaseInput(source="webhook", format=InputFormat.JSON, intent=intent),
+        agent_responses=[AgentResponse(success=True, message="ok", next_action="create_ticket")]
+    )
+    if timestamp is not None:
+        entry.created_at = entry.created_at.fromtimestamp(timestamp)
+    return entry
+
+@pytest.fixture
+def components():
+    components = Components()
+    server = fakeredis.FakeServer()
+    components.memory_store.redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+    components.__dict__["control_redis"] = fakeredis.FakeRedis(server=server, decode_responses=True)
+    return components
+
+def test_scan_entries_walks_every_partition_once():
+    store = MemoryStore(partitions=4)
+    store.redis = fakeredis.FakeRedis(decode_responses=True)
+    # Several entries share a timestamp, so the cursor has to break ties by ID
+    for i in range(23):
+        store.store_entry(make_entry(f"e{i:02d}", timestamp=1700000000 + i // 3))
+
+    seen, cursor = [], None
+    while True:
+        entries, cursor = store.scan_entries(cursor, count=5)
+        seen.extend(entry.id for entry in entries)
+        if cursor is None:
+            break
+    assert sorted(seen) == [f"e{i:02d}" for i in range(23)]
+
+def test_content_is_stored_and_deleted_with_the_entry(components):
+    store = components.memory_store
+    store.store_entry(make_entry("e1"), content=INVOICE)
+    assert store.get_content("e1") == INVOICE
+    assert 0 < store.redis.ttl(store._get_key("content:e1", store._partition("e1"))) <= store.content_ttl
+    store.delete_entry("e1")
+    assert store.get_content("e1") is None
+
+    # Inputs over the size cap are not kept
+    store.content_max_bytes = len(INVOICE) - 1
+    store.store_entry(make_entry("e2"), content=INVOICE)
+    assert store.get_content("e2") is None and store.get_entry("e2")
+
+@pytest.mark.asyncio
+async def test_reprocess_writes_back_only_changed_entries(components):
+    store = components.memory_store
+    store.store_entry(make_entry("stale", intent=BusinessIntent.REGULATION), content=INVOICE)
+    store.store_entry(make_entry("legacy"))
+
+    dry = await ReprocessJob(components, rate=0, dry_run=True).run()
+    assert dry["counts"]["changed"] == 1 and dry["counts"]["no_content"] == 1
+    assert store.get_entry("stale").input_data.intent == BusinessIntent.REGULATION
+
+    report = await ReprocessJob(components, rate=0).run()
+    assert report["complete"]
+    assert report["changes"][0]["changes"]["intent"] == ["regulation", "invoice"]
+    assert report["changes_by_field"]["intent"] == {"regulation -> invoice": 1}
+
+    entry = store.get_entry("stale")
+    assert entry.input_data.intent == BusinessIntent.INVOICE
+    assert entry.input_data.metadata["reprocessed"]["job_id"] == report["job_id"]
+    assert len(entry.agent_responses) == 2
+    assert entry.agent_responses[-1].data["routing"]["rule"] == "default"
+
+    # A second pass over the updated store finds nothing to change
+    again = await ReprocessJob(components, rate=0).run()
+    assert again["counts"]["changed"] == 0 and again["counts"]["unchanged"] == 1
+
+@pytest.mark.asyncio
+async def test_reprocess_resumes_from_its_checkpoint(components):
+    for i in range(5):
+        components.memory_store.store_entry(make_entry(f"e{i}", intent=BusinessIntent.RFQ), content=INVOICE)
+
+    first = ReprocessJob(components, rate=0, batch_size=2)
+    partial = await first.run(max_entries=2)
+    assert not partial["complete"] and partial["counts"]["scanned"] == 2
+
+    resumed = ReprocessJob(components, job_id=first.job_id, rate=0, batch_size=2)
+    assert resumed.resume()
+    report = await resumed.run()
+    assert report["complete"]
+    assert report["counts"]["scanned"] == 5 and report["counts"]["changed"] == 5
+    assert sorted(c["id"] for c in report["changes"]) == [f"e{i}" for i in range(5)]
+
+@pytest.mark.asyncio
+async def test_resumed_dry_run_stays_dry(components):
+    for i in range(4):
+        components.memory_store.store_entry(make_entry(f"e{i}", intent=BusinessIntent.RFQ), content=INVOICE)
+
+    first = ReprocessJob(components, rate=0, batch_size=2, dry_run=True)
+    await first.run(max_entries=2)
+
+    resumed = ReprocessJob(components, job_id=first.job_id, rate=0, batch_size=2)
+    assert resumed.resume() and resumed.dry_run
+    await resumed.run()
+    assert all(components.memory_store.get_entry(f"e{i}").input_data.intent == BusinessIntent.RFQ for i in range(4))
+
+def invoice_email():
+    message = MIMEMultipart()
+    message["From"] = "billing@acme.com"
+    message["Subject"] = "Invoice attached"
+    message.attach(MIMEText("Please find the invoice attached."))
+    attachment = MIMEApplication(INVOICE, "json", Name="invoice.json")
+    attachment["Content-Disposition"] = 'attachment; filename="invoice.json"'
+    message.attach(attachment)
+    return message.as_string()
+
+@pytest.mark.asyncio
+async def test_unchanged_multipart_email_is_not_rewritten(components):
+    entry = make_entry("mail")
+    entry.input_data = entry.input_data.model_copy(update={"format": InputFormat.EMAIL, "source": "email"})
+    components.memory_store.store_entry(entry, content=invoice_email())
+
+    first = await ReprocessJob(components, rate=0).run()
+    assert first["counts"]["changed"] == 1
+    responses = len(components.memory_store.get_entry("mail").agent_responses)
+
+    # The attachment's parse timestamp is new on every run, but nothing else changed
+    second = await ReprocessJob(components, rate=0).run()
+    assert second["counts"]["unchanged"] == 1 and second["counts"]["changed"] == 0
+    assert len(components.memory_store.get_entry("mail").agent_responses) == responses
@@ -0,0 +1,88 @@
+import fakeredis
+import pytest
+from app.core.stats import StatisticsEngine
+from app.core.identifiers import extract_identifiers
+from app.models.schemas import InputFormat, AgentResponse
+
+NOW = 1_700_000_000.0
+
+@pytest.fixture
+def stats_engine():
+    engine = StatisticsEngine(min_samples=5)
+    engine.redis = fakeredis.FakeRedis(decode_responses=True)
+    return engine
+
+def test_amount_outlier_is_flagged(stats_engine):
+    for i, amount in enumerate([100, 110, 95, 105, 98, 102]):
+        assert stats_engine.observe("acme", "webhook", amount, "USD", now=NOW - i * 3600) == []
+
+    signals = stats_engine.observe("acme", "webhook", 50000, "USD", now=NOW)
+    assert any("standard deviations" in s for s in signals)
+
+def test_currency_change_is_flagged(stats_engine):
+    for i in range(5):
+        stats_engine.observe("acme", "webhook", 100, "USD", now=NOW - i * 3600)
+
+    signals = stats_engine.observe("acme", "webhook", 100, "EUR", now=NOW)
+    assert signals == ["Sender currency changed from USD to EUR"]
+
+def test_submission_burst_is_flagged(stats_engine):
+    for i in range(1, 6):
+        stats_engine.observe("acme", "webhook", 100, now=NOW - i * 3600)
+
+    signals = []
+    for _ in range(5):
+        signals = stats_engine.observe("acme", "webhook", 100, now=NOW)
+    assert "Submission burst for sender:acme: 5 in the current interval" in signals
+
+def test_window_expires_old_buckets(stats_engine):
+    stats_engine.observe("acme", "webhook", 100, now=NOW - 48 * 3600)
+    assert stats_engine.window("sender:acme", now=NOW)["count"] == 0
+
+def test_new_payees_are_counted_within_the_window(stats_engine):
+    # Enough intake on the source for the new-sender check to apply
+    for i in range(1, 6):
+        stats_engine.observe(None, "webhook", 100, now=NOW - i * 3600)
+
+    signals = []
+    for i in range(6):
+        signals = stats_engine.observe(f"payee{i}", "webhook", 100, now=NOW)
+    assert "Burst of 6 new senders on source:webhook in the current interval" in signals
+    # Seen earlier in the window, so not new again
+    assert stats_engine.observe("payee0", "webhook", 100, now=NOW + 3600) == []
+    assert stats_engine.window("source:webhook", now=NOW + 3600)["current_new_payees"] == 0
+
+    # Sender state expires with the window instead of growing forever
+    assert 0 < stats_engine.redis.ttl("flowbit:stats:source:webhook:payees:" + str(int(NOW // 3600))) <= 25 * 3600
+
+def test_correspondence_does_not_raise_burst_signals(stats_engine):
+    # About two emails an hour, then seven from different senders, none billing anything
+    for i in range(1, 6):
+        for j in range(2):
+            stats_engine.observe(f"old{i}-{j}@example.com", None, now=NOW - i * 3600)
+    for i in range(7):
+        assert stats_engine.observe(f"new{i}@example.com", None, now=NOW) == []
+    # Nor with a named channel
+    for i in range(7):
+        assert stats_engine.observe(f"other{i}@example.com", "mailbox", now=NOW) == []
+
+def test_extract_identifiers_from_pdf_text():
+    result = AgentResponse(
+        success=True,
+        message="PDF processed successfully",
+        data={"text": "INVOICE\nInvoice Number: INV-2024-002\nTotal Amount: $5,000.00"}
+    )
+    identifiers = extract_identifiers(InputFormat.PDF, result)
+    assert identifiers["invoice_number"] == "INV-2024-002"
+    assert identifiers["amount"] == 5000.0
+    assert identifiers["currency"] == "USD"
+    assert identifiers["source"] == "pdf"
+
+def test_extract_identifiers_ignores_words_that_are_not_amounts():
+    result = AgentResponse(
+        success=True,
+        message="Email processed successfully",
+        data={"fields": {"from": "Ann <ann@example.com>", "subject": "Question", "body": "What is the total, please?"}}
+    )
+    identifiers = extract_identifiers(InputFormat.EMAIL, result)
+    assert identifiers["amount"] is None and identifiers["sender"] == "ann@example.com"
@@ -0,0 +1,111 @@
+import asyncio
+import time
+import uuid
+import fakeredis
+import pytest
+from app.core.profiling import SamplingProfiler
+from app.core.tracing import Tracer, span, traced
+
+class ListExporter:
+    def __init__(self):
+        self.payloads = []
+
+    def export(self, payload):
+        self.payloads.append(payload)
+
+    def close(self):
+        pass
+
+    def spans(self):
+        return [
+            s for payload in self.payloads
+            for resource in payload["resourceSpans"]
+            for scope in resource["scopeSpans"]
+            for s in scope["spans"]
+        ]
+
+@traced("work.async")
+async def async_work():
+    await asyncio.sleep(0)
+    return await asyncio.to_thread(sync_work)
+
+@traced("work.sync")
+def sync_work():
+    return 42
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def test_spans_are_no_ops_outside_a_trace():
+    with span("orphan") as orphan:
+        assert orphan is None
+    assert sync_work() == 42
+
+@pytest.mark.asyncio
+async def test_trace_records_nested_spans_under_the_process_id():
+    exporter = ListExporter()
+    tracer = Tracer(exporter)
+    process_id = str(uuid.uuid4())
+
+    with tracer.trace("process", process_id, source="test"):
+        with span("stage"):
+            assert await async_work() == 42
+    tracer.close()
+
+    spans = {s["name"]: s for s in exporter.spans()}
+    assert set(spans) == {"process", "stage", "work.async", "work.sync"}
+    assert {s["traceId"] for s in spans.values()} == {uuid.UUID(process_id).hex}
+    # Spans ending in worker threads keep their parent
+    assert spans["work.sync"]["parentSpanId"] == spans["work.async"]["spanId"]
+    assert spans["work.async"]["parentSpanId"] == spans["stage"]["spanId"]
+    assert "parentSpanId" not in spans["process"]
+
+def test_errors_are_recorded_and_slow_traces_kept_when_unsampled():
+    exporter = ListExporter()
+    tracer = Tracer(exporter, sample_rate=0.0, slow_ms=20)
+
+    with tracer.trace("process", str(uuid.uuid4())):
+        pass
+    with pytest.raises(ValueError):
+        with tracer.trace("process", str(uuid.uuid4())):
+            busy(0.03)
+            with span("failing"):
+                raise ValueError("boom")
+    tracer.close()
+
+    spans = {s["name"]: s for s in exporter.spans()}
+    assert set(spans) == {"process", "failing"}
+    assert spans["failing"]["status"] == {"code": 2, "message": "ValueError: boom"}
+
+@pytest.mark.asyncio
+async def test_profiler_captures_the_next_n_requests():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.arm(requests=1)
+
+    with profiler.capture("first"):
+        busy(0.05)
+    with profiler.capture("second") as capture:
+        assert capture is None
+
+    captures = profiler.captures()
+    assert [c["process_id"] for c in captures] == ["first"]
+    assert captures[0]["samples"] > 0
+    assert "busy (test_tracing.py" in profiler.folded("first")
+
+@pytest.mark.asyncio
+async def test_slow_mode_is_shared_through_redis():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    armer = SamplingProfiler(client)
+    worker = SamplingProfiler(client, interval=0.001, poll_interval=0.0)
+    armer.arm(requests=1, slow_ms=20)
+
+    with worker.capture("fast"):
+        pass
+    with worker.capture("slow"):
+        busy(0.03)
+
+    assert [c["process_id"] for c in armer.captures()] == ["slow"]
+    # The budget of one slow capture is spent
+    assert worker.status()["armed"] is None